@@ -1,169 +1,259 @@
+import time
+_import_started = time.perf_counter()
+
 import json
 import datetime
-import urllib.request
 import urllib.parse
 import os
-import nltk
 import random
 import re
-from difflib import SequenceMatcher
-from nltk.sentiment import SentimentIntensityAnalyzer
+import sys
+from concurrent.futures import ThreadPoolExecutor, TimeoutError as FutureTimeout
 
 # --- IMPORT THE VISUAL VAULT ---
 try:
     from image_library import IMAGE_PROMPTS
 except ImportError:
     IMAGE_PROMPTS = {"INFOGRAPHIC": ["Global geopolitical map abstract"]}
+from dedup_index import DedupIndex
+import taxonomy
+import sentiment
+import http_client
+import response_cache
+from image_resolver import ImageResolver
+import history_store
+from history_store import HistoryStore
+import chart_series
+import artifacts
+from instrumentation import metrics, profiled
+from pillar_registry import load_registry
+from scheduler import Scheduler, route
+from narrative_cache import NarrativeCache
+from alert_store import AlertStore
+from article_pipeline import RunContext, TOP_ALERTS, score_articles, top_alerts
 
 # --- 1. NLP & CONFIGURATION ---
-try:
-    nltk.data.find('sentiment/vader_lexicon.zip')
-except LookupError:
-    nltk.download('vader_lexicon', quiet=True)
-sia = SentimentIntensityAnalyzer()
+# The VADER model is loaded on first use (see sentiment.py), not at import time
+# Per-run alert state lives on an article_pipeline.RunContext (see new_run_context)
+
+# Seconds each upstream gets (measured from the start of the run) before we fall back to its baseline
+SOURCE_DEADLINES = {
+    "newsdata": 40, "alphavantage": 30, "frankfurter": 15,
+    "usgs": 20, "pexels": 20
+}
+FETCH_WORKERS = 12
+GEMINI_READ_TIMEOUT = 90
+
+# Pillars, weights, news queries, feeds, API quotas and page/article caps are declared in pillars.json
+registry = load_registry()
+# Sources behind an API key are skipped, without spending quota, when the key is not set
+API_KEY_NAMES = {"newsdata": "NEWSDATA_API_KEY", "alphavantage": "ALPHA_VANTAGE_KEY"}
+scheduler = Scheduler(registry, force=response_cache.MODE in ("record", "replay"),
+                      available=lambda source: source not in API_KEY_NAMES or get_api_key(API_KEY_NAMES[source]) is not None)
 
-global_alerts = []
+dedup_index = DedupIndex()
+history = HistoryStore()
+narrative_cache = NarrativeCache()
+# Published alerts carried between runs; a run only adds the stories that are new to the dedup index
+alert_store = AlertStore()
+
+def get_api_key(name):
+    """Reads an API key; replay mode serves fixtures with credentials stripped, so any placeholder will do."""
+    return os.environ.get(name) or ("replay" if response_cache.MODE == "replay" else None)
 
 # --- 2. DEDUPLICATION ENGINE ---
-def is_duplicate(new_title, existing_alerts, threshold=0.65):
-    """Checks for semantic similarity to avoid echo-chamber alerts."""
-    for alert in existing_alerts:
-        if SequenceMatcher(None, new_title.lower(), alert['title'].lower()).ratio() > threshold:
-            return True
-    return False
+# Repeats within a run are dropped by article_pipeline.dedup against the run's own RunContext.seen;
+# stories an earlier run committed to dedup_index pass through but are not alerted again.
 
 # --- 3. IMAGE FETCHING ENGINES ---
+def pick_image_prompt(category):
+    return random.choice(IMAGE_PROMPTS.get(category) or IMAGE_PROMPTS.get("INFOGRAPHIC", ["Abstract global news background"]))
+
 def get_cinematic_query(headline):
-    text_lower = headline.lower()
-    if any(x in text_lower for x in ["war", "conflict", "military", "army", "weapon", "border", "defense", "missile", "troops", "strike"]): 
-        return random.choice(IMAGE_PROMPTS.get("GEOPOLITICS", ["Global conflict map"]))
-    if any(x in text_lower for x in ["ship", "port", "sea", "maritime", "canal", "vessel", "freight", "shipping", "pirate", "navy"]): 
-        return random.choice(IMAGE_PROMPTS.get("MARITIME", ["Cargo ship at sea"]))
-    if any(x in text_lower for x in ["oil", "gas", "energy", "pipeline", "fuel", "lng", "barrel", "opec", "drilling"]): 
-        return random.choice(IMAGE_PROMPTS.get("ENERGY", ["Oil refinery at night"]))
-    if any(x in text_lower for x in ["cyber", "hack", "data", "ransomware", "digital", "network", "server", "bot"]): 
-        return random.choice(IMAGE_PROMPTS.get("CYBER", ["Hacker code screen"]))
-    if any(x in text_lower for x in ["climate", "flood", "drought", "storm", "weather", "carbon", "heat", "disaster"]): 
-        return random.choice(IMAGE_PROMPTS.get("CLIMATE", ["Climate change landscape"]))
-    if any(x in text_lower for x in ["sanction", "embargo", "seize", "freeze", "law", "court", "ban", "blacklist"]): 
-        return random.choice(IMAGE_PROMPTS.get("SANCTIONS", ["Gavel and treaty"]))
-    if any(x in text_lower for x in ["chip", "tech", "semiconductor", "ai", "5g", "robot", "satellite", "space"]): 
-        return random.choice(IMAGE_PROMPTS.get("TECH", ["Semiconductor chip"]))
-    if any(x in text_lower for x in ["economy", "trade", "tariff", "bank", "market", "stock", "finance", "inflation", "currency", "debt"]): 
-        return random.choice(IMAGE_PROMPTS.get("ECONOMY", ["Stock market chart"]))
-    return random.choice(IMAGE_PROMPTS.get("INFOGRAPHIC", ["Abstract global news background"]))
-
-def fetch_pexels_fallback(query):
-    api_key = os.environ.get("PEXELS_API_KEY")
-    default_image = "https://images.pexels.com/photos/373543/pexels-photo-373543.jpeg?auto=compress&cs=tinysrgb&w=600"
-    if not api_key: return default_image
-    try:
-        encoded_query = urllib.parse.quote(query)
-        url = f"https://api.pexels.com/v1/search?query={encoded_query}&per_page=1&orientation=landscape"
-        req = urllib.request.Request(url, headers={'Authorization': api_key, 'User-Agent': 'AvellonBot/1.0'})
-        with urllib.request.urlopen(req) as response:
-            data = json.loads(response.read().decode("utf-8"))
-            if data['photos'] and len(data['photos']) > 0:
-                return data['photos'][0]['src']['medium']
-    except Exception: pass 
-    return default_image
+    return pick_image_prompt(taxonomy.image_category(headline))
+
+DEFAULT_IMAGE = "https://images.pexels.com/photos/373543/pexels-photo-373543.jpeg?auto=compress&cs=tinysrgb&w=600"
+
+@metrics.source("search_pexels")
+def search_pexels(query):
+    """Top landscape photo for a query, or None. Only the image resolver's warm thread calls this."""
+    api_key = get_api_key("PEXELS_API_KEY")
+    if not api_key: return metrics.fallback(None, "no API key")
+    encoded_query = urllib.parse.quote(query)
+    url = f"https://api.pexels.com/v1/search?query={encoded_query}&per_page=1&orientation=landscape"
+    data = http_client.get_json(url, headers={'Authorization': api_key, 'User-Agent': 'AvellonBot/1.0'}, timeout=SOURCE_DEADLINES["pexels"])
+    if data['photos'] and len(data['photos']) > 0:
+        return data['photos'][0]['src']['medium']
+    return metrics.fallback(None, "no results")
+
+image_resolver = ImageResolver(IMAGE_PROMPTS, search_pexels)
 
 # --- 4. RISK CLASSIFICATION & API ---
 def classify_risk_level(text):
-    text_lower = text.lower()
-    high_keywords = ["war", "conflict", "sanction", "embargo", "blockade", "military", "crisis", "disaster", "collapse", "attack", "breach", "shortage", "nuclear"]
-    med_keywords = ["tension", "tariff", "dispute", "warning", "risk", "volatile", "talks", "regulatory", "uncertainty", "debate", "meeting", "proposal", "monitor", "review", "election"]
-    
-    if sum(1 for k in high_keywords if k in text_lower) >= 1: return "HIGH"
-    if sum(1 for k in med_keywords if k in text_lower) >= 1: return "MEDIUM"
-    return "WATCH"
+    return taxonomy.risk_level(text)
 
-def fetch_newsdata_risk(query, baseline_score):
-    global global_alerts
-    api_key = os.environ.get("NEWSDATA_API_KEY")
-    if not api_key: return baseline_score
-
-    try:
+def iter_newsdata_articles(query, api_key, max_pages=1, take_page=None, cache_ttl=None):
+    """Streams a query's articles, newest first, following newsdata's nextPage cursor. Pages are fetched
+    only as the consumer reaches them; take_page() is asked before each extra page (each costs API quota)."""
+    page = None
+    for n in range(max_pages):
+        if n and take_page and not take_page(): return
         encoded_q = urllib.parse.quote(query)
-        # Fetch 10 items to ensure Medium/Watch buckets are filled
         url = f"https://newsdata.io/api/1/news?apikey={api_key}&q={encoded_q}&language=en&prioritydomain=top"
-        req = urllib.request.Request(url, headers={'User-Agent': 'AvellonBot/2.0'})
-        with urllib.request.urlopen(req) as response:
-            data = json.loads(response.read().decode("utf-8"))
-            results = data.get('results', [])
-            risk_modifier = 0
-            
-            for article in results[:10]: 
-                title = article.get('title', '')
-                if is_duplicate(title, global_alerts): continue 
-                
-                desc = article.get('description') or ''
-                link = article.get('link', '#')
-                full_text = f"{title} {desc}"
-                severity = classify_risk_level(full_text)
-                
-                img_url = article.get('image_url')
-                if not img_url:
-                    img_url = fetch_pexels_fallback(get_cinematic_query(title))
-                
-                global_alerts.append({
-                    "title": title, "severity": severity, "url": link,
-                    "image": img_url, "source": article.get('source_id', 'Global News')
-                })
-                
-                sentiment = sia.polarity_scores(full_text)['compound']
-                if sentiment < -0.2: risk_modifier += 1.2
-                elif sentiment > 0.2: risk_modifier -= 0.5
-                if severity == "HIGH": risk_modifier += 2.0
-                elif severity == "MEDIUM": risk_modifier += 0.8
-
-            return round(min(max(baseline_score + risk_modifier, 20), 100), 1)
+        if page: url += f"&page={urllib.parse.quote(page)}"
+        data = http_client.get_json(url, timeout=SOURCE_DEADLINES["newsdata"], cache_ttl=cache_ttl)
+        yield from data.get('results', [])
+        page = data.get('nextPage')
+        if not page: return
+
+@metrics.source("fetch_newsdata_articles")
+def fetch_newsdata_articles(query, max_pages=1, take_page=None):
+    """Network half of the news pillar: an iterator over raw articles, or None if the source is unavailable.
+    The first page is fetched here, so the orchestrator's deadline bounds this call; later pages are
+    fetched only as the scorer reaches them, and only while take_page() allows."""
+    api_key = get_api_key("NEWSDATA_API_KEY")
+    if not api_key: return metrics.fallback(None, "no API key")
+
+    try:
+        articles = iter_newsdata_articles(query, api_key, max_pages, take_page)
+        return _later_pages(query, next(articles, None), articles)
+    except Exception as e:
+        print(f"API Error for {query}: {e}")
+        return metrics.fallback(None, f"error: {type(e).__name__}")
+
+def _later_pages(query, first, articles):
+    """Yields first, then the rest; a failing later page ends the stream instead of voiding the query's score."""
+    if first is None: return
+    yield first
+    try:
+        yield from articles
+    except Exception as e:
+        print(f"API Error for {query} (later page): {e}")
+
+def article_key(article):
+    return article.get("article_id") or article.get("link") or article.get("title", "")
+
+@metrics.source("fetch_newsdata_since")
+def fetch_newsdata_since(query, seen, max_pages=3, take_page=None):
+    """Incremental poll for daemon mode: reads newest-first until the first already-seen article, so no
+    page past it is fetched. Returns only unseen articles, newest first, or None."""
+    api_key = get_api_key("NEWSDATA_API_KEY")
+    if not api_key: return metrics.fallback(None, "no API key")
+
+    fresh = []
+    try:
+        # The response cache would hide new articles; polls always go to the network
+        for article in iter_newsdata_articles(query, api_key, max_pages, take_page, cache_ttl=0):
+            if article_key(article) in seen: break
+            fresh.append(article)
+        return fresh
+    except Exception as e:
+        print(f"API Error for {query}: {e}")
+        return metrics.fallback(fresh or None, f"error: {type(e).__name__}")
+
+def new_run_context(max_alerts=TOP_ALERTS):
+    """Fresh per-run state. Its stories reach the shared dedup index only on ctx.commit()."""
+    return RunContext(datetime.datetime.utcnow().isoformat() + "Z", dedup_index, image_resolver, pick_image_prompt, max_alerts)
+
+def score_newsdata_articles(ctx, query, results, baseline_score, limit=None):
+    """CPU half of the news pillar: streams up to limit articles (None: all) through the article_pipeline
+    stages in arrival order.
+    Stories already alerted in an earlier run still count towards the score but are not re-alerted.
+    Alerts land on ctx.alerts; cold image prompts wait on ctx.pending_images."""
+    if results is None: return baseline_score
+    try:
+        return score_articles(ctx, results, baseline_score, limit)
     except Exception as e:
         print(f"API Error for {query}: {e}")
         return baseline_score
 
+def resolve_pending_images(ctx, deadline=None):
+    """Gives the background image warm-up until the deadline, then fills the context's queued alerts from the cache."""
+    queued = ctx.take_pending_images()
+    if not queued: return
+    image_resolver.wait_for([(p, c) for _, p, c in queued], None if deadline is None else max(deadline - time.monotonic(), 0))
+    for alert, prompt, category in queued:
+        alert["image"] = image_resolver.lookup(prompt, category) or DEFAULT_IMAGE
+
+def fetch_newsdata_risk(query, baseline_score, ctx=None):
+    ctx = ctx or new_run_context()
+    max_pages, max_articles = registry.news_limits("newsdata")
+    results = fetch_newsdata_articles(query, max_pages)
+    score = score_newsdata_articles(ctx, query, results, baseline_score, max_articles)
+    resolve_pending_images(ctx)
+    return score
+
 # --- 5. FINANCIAL & PHYSICAL DATA ---
+# Each market/physical pillar is a clamped linear map of one live reading:
+#   score = min(max(base + (deviation * slope), floor), ceiling), deviation = reading - center (or its abs)
+# The rules are data so backtest.py can replay history.jsonl under alternative ones.
+CLAMP_RULES = {
+    "Currency & Liquidity Pressure": {"driver": "eur_per_usd", "base": 40, "center": 0.90, "slope": 100, "abs": True, "floor": 0, "ceiling": 100},
+    # Final energy pillar is the higher of this and the energy news score (Safety Protocol)
+    "Energy & Maritime Disruption": {"driver": "brent_usd", "base": 50, "center": 75, "slope": 1.5, "floor": 20, "ceiling": 100, "at_least": "energy_news"},
+    "Sovereign Financial Stress": {"driver": "ust_10y_yield", "base": 50, "center": 4.0, "slope": 10, "floor": 20, "ceiling": 100},
+    # Scoring: 25 Base + 10 points per Major event. Max 100.
+    "Climate & Resource Shock": {"driver": "major_quakes", "base": 25, "center": 0, "slope": 10, "floor": None, "ceiling": 100},
+}
+# FIX: Threshold raised to 5.8 to filter out noise. Only Major events count.
+MAJOR_QUAKE_MAGNITUDE = 5.8
+
+# Raw readings behind this run's market/physical pillars; stored with the run in history.jsonl
+driver_readings = {}
+
+def apply_clamp_rule(pillar, reading, rules=CLAMP_RULES):
+    rule = rules[pillar]
+    deviation = abs(reading - rule["center"]) if rule.get("abs") else reading - rule["center"]
+    score = rule["base"] + (deviation * rule["slope"])
+    if rule["floor"] is not None: score = max(score, rule["floor"])
+    return round(min(score, rule["ceiling"]), 1)
+
+# Feed fetchers return None when unavailable; the caller substitutes the feed's fallback from pillars.json
+@metrics.source("fetch_currency_risk")
 def fetch_currency_risk():
     try:
         url = "https://api.frankfurter.app/latest?from=USD"
-        with urllib.request.urlopen(url) as response:
-            data = json.loads(response.read().decode("utf-8"))
-            return round(min(max(40 + (abs(data['rates']['EUR'] - 0.90) * 100), 0), 100), 1)
-    except: return 50.0
+        data = http_client.get_json(url, timeout=SOURCE_DEADLINES["frankfurter"])
+        rate = data['rates']['EUR']
+        driver_readings["eur_per_usd"] = rate
+        return apply_clamp_rule("Currency & Liquidity Pressure", rate)
+    except Exception as e: return metrics.fallback(None, f"error: {type(e).__name__}")
 
+@metrics.source("fetch_climate_risk")
 def fetch_climate_risk():
     try:
         url = "https://earthquake.usgs.gov/earthquakes/feed/v1.0/summary/4.5_day.geojson"
-        with urllib.request.urlopen(url) as response:
-            data = json.loads(response.read().decode("utf-8"))
-            # FIX: Threshold raised to 5.8 to filter out noise. Only Major events count.
-            significant_events = [f for f in data['features'] if f['properties']['mag'] >= 5.8]
-            # Scoring: 25 Base + 10 points per Major event. Max 100.
-            return round(min(25 + (len(significant_events) * 10), 100), 1)
-    except: return 40.0
+        # Static feed: revalidated with ETag/If-Modified-Since, so an unchanged feed is a 304
+        data = http_client.get_json(url, timeout=SOURCE_DEADLINES["usgs"], conditional=True)
+        significant_events = [f for f in data['features'] if f['properties']['mag'] >= MAJOR_QUAKE_MAGNITUDE]
+        driver_readings["major_quakes"] = len(significant_events)
+        return apply_clamp_rule("Climate & Resource Shock", len(significant_events))
+    except Exception as e: return metrics.fallback(None, f"error: {type(e).__name__}")
 
+@metrics.source("fetch_energy_price_risk")
 def fetch_energy_price_risk():
     # Only fetches the PRICE component
-    api_key = os.environ.get("ALPHA_VANTAGE_KEY")
-    if not api_key: return 50.0
+    api_key = get_api_key("ALPHA_VANTAGE_KEY")
+    if not api_key: return metrics.fallback(None, "no API key")
     try:
         url = f"https://www.alphavantage.co/query?function=BRENT&interval=daily&apikey={api_key}"
-        with urllib.request.urlopen(url) as response:
-            data = json.loads(response.read().decode("utf-8"))
-            val = float(data["data"][0]["value"])
-            return round(min(max(50 + ((val - 75) * 1.5), 20), 100), 1)
-    except: return 50.0
+        data = http_client.get_json(url, timeout=SOURCE_DEADLINES["alphavantage"])
+        val = float(data["data"][0]["value"])
+        driver_readings["brent_usd"] = val
+        return apply_clamp_rule("Energy & Maritime Disruption", val)
+    except Exception as e: return metrics.fallback(None, f"error: {type(e).__name__}")
 
+@metrics.source("fetch_sovereign_risk")
 def fetch_sovereign_risk():
-    api_key = os.environ.get("ALPHA_VANTAGE_KEY")
-    if not api_key: return 55.0
+    api_key = get_api_key("ALPHA_VANTAGE_KEY")
+    if not api_key: return metrics.fallback(None, "no API key")
     try:
         url = f"https://www.alphavantage.co/query?function=TREASURY_YIELD&interval=daily&maturity=10year&apikey={api_key}"
-        with urllib.request.urlopen(url) as response:
-            data = json.loads(response.read().decode("utf-8"))
-            val = float(data["data"][0]["value"])
-            return round(min(max(50 + ((val - 4.0) * 10), 20), 100), 1)
-    except: return 55.0
+        data = http_client.get_json(url, timeout=SOURCE_DEADLINES["alphavantage"])
+        val = float(data["data"][0]["value"])
+        driver_readings["ust_10y_yield"] = val
+        return apply_clamp_rule("Sovereign Financial Stress", val)
+    except Exception as e: return metrics.fallback(None, f"error: {type(e).__name__}")
 
 # --- 6. AI INTERPRETATION LAYER ---
 def clean_json_response(text):
@@ -172,9 +262,10 @@ def clean_json_response(text):
     if match: return match.group(1)
     return text.strip()
 
+@metrics.source("call_gemini")
 def call_gemini(prompt):
-    api_key = os.environ.get("GEMINI_API_KEY")
-    if not api_key: return {"main_brief": "System Offline.", "pillar_narratives": {}}
+    api_key = get_api_key("GEMINI_API_KEY")
+    if not api_key: return metrics.fallback({"main_brief": "System Offline.", "pillar_narratives": {}}, "no API key")
     url = f"https://generativelanguage.googleapis.com/v1beta/models/gemini-2.5-flash:generateContent?key={api_key}"
     
     # UPDATED SYSTEM PROMPT: Forces detailed justification and real citations
@@ -205,61 +296,160 @@ def call_gemini(prompt):
     data = {"contents": [{"parts": [{"text": prompt}]}], "systemInstruction": {"parts": [{"text": sys}]}, "generationConfig": {"responseMimeType": "application/json"}}
     
     try:
-        req = urllib.request.Request(url, data=json.dumps(data).encode("utf-8"), headers={"Content-Type": "application/json"})
-        with urllib.request.urlopen(req) as response:
-            raw_text = json.loads(response.read().decode("utf-8"))["candidates"][0]["content"]["parts"][0]["text"]
-            result = json.loads(clean_json_response(raw_text))
-            
-            # FALLBACK FILLER
-            keys = ["Geopolitical Conflict Intensity", "Energy & Maritime Disruption", "Trade & Supply Chain Stress", 
-                    "Sovereign Financial Stress", "Currency & Liquidity Pressure", "Sanctions & Regulatory Fragmentation", 
-                    "Cyber & Infrastructure Threats", "Climate & Resource Shock"]
-            for k in keys:
-                if k not in result.get("pillar_narratives", {}):
-                    if "pillar_narratives" not in result: result["pillar_narratives"] = {}
-                    result["pillar_narratives"][k] = "Sector showing baseline activity levels; monitoring for emerging volatility."
-            
-            return result
+        # Generation is slow; give it a long read timeout and a single retry
+        response = http_client.post_json(url, data, timeout=(5.0, GEMINI_READ_TIMEOUT), retries=1)
+        raw_text = response["candidates"][0]["content"]["parts"][0]["text"]
+        result = json.loads(clean_json_response(raw_text))
+        
+        # FALLBACK FILLER
+        keys = ["Geopolitical Conflict Intensity", "Energy & Maritime Disruption", "Trade & Supply Chain Stress", 
+                "Sovereign Financial Stress", "Currency & Liquidity Pressure", "Sanctions & Regulatory Fragmentation", 
+                "Cyber & Infrastructure Threats", "Climate & Resource Shock"]
+        for k in keys:
+            if k not in result.get("pillar_narratives", {}):
+                if "pillar_narratives" not in result: result["pillar_narratives"] = {}
+                result["pillar_narratives"][k] = "Sector showing baseline activity levels; monitoring for emerging volatility."
+        
+        return result
     except Exception as e:
         print(f"AI Generation Error: {e}")
-        return {"main_brief": "Analyst system calibrating.", "pillar_narratives": {}}
+        return metrics.fallback({"main_brief": "Analyst system calibrating.", "pillar_narratives": {}}, f"error: {type(e).__name__}")
+
+# --- 7. CONCURRENT FETCH ORCHESTRATOR ---
+def await_source(future, deadline, fallback, name, source=None):
+    """Waits for a source until its deadline (absolute monotonic time); falls back to the baseline on timeout."""
+    remaining = None if deadline is None else max(deadline - time.monotonic(), 0)
+    try:
+        return future.result(timeout=remaining)
+    except FutureTimeout:
+        print(f"Deadline exceeded for {name}; using baseline.")
+        metrics.note_fallback(source or name, "deadline")
+    except Exception as e:
+        print(f"Source error for {name}: {e}")
+    return fallback
+
+# --- 8. MASTER CALCULATOR ---
+PILLAR_WEIGHTS = registry.weights()
+FEED_FUNCTIONS = {
+    "brent": (fetch_energy_price_risk, "BRENT"), "treasury": (fetch_sovereign_risk, "TREASURY_YIELD"),
+    "fx": (fetch_currency_risk, "frankfurter"), "usgs": (fetch_climate_risk, "USGS"),
+}
+# The driver_readings key each feed's fetcher fills, from the clamp rule of the pillar it backs
+FEED_DRIVERS = {p["feed"]: CLAMP_RULES[name]["driver"] for name, p in registry.pillars.items() if p.get("feed") and name in CLAMP_RULES}
+
+def gather_feed_scores(feed_futures, deadline):
+    """Feed scores for this run: fresh where fetched in time, the feed's fallback where a fetch failed,
+    and the last good score for feeds the scheduler did not run. Skipped feeds also put their last raw
+    reading back into driver_readings, so every history row can be recomputed exactly by backtest.py."""
+    feed_scores = {}
+    for feed_id, feed in registry.feeds.items():
+        driver = FEED_DRIVERS.get(feed_id)
+        if feed_id in feed_futures:
+            fetch, label = FEED_FUNCTIONS[feed_id]
+            score = await_source(feed_futures[feed_id], deadline(feed["source"]), None, label, fetch.__name__)
+            if score is not None: scheduler.record(feed_id, score, reading=driver_readings.get(driver))
+            feed_scores[feed_id] = feed["fallback"] if score is None else score
+        else:
+            last = scheduler.last_score(feed_id)
+            feed_scores[feed_id] = feed["fallback"] if last is None else last
+            reading = scheduler.last_reading(feed_id)
+            if last is not None and reading is not None: driver_readings[driver] = reading
+    return feed_scores
+
+def combine_pillars(query_scores, feed_scores):
+    """Pillar scores from per-query news scores and per-feed scores, in registry order."""
+    live_inputs = {}
+    for name, pillar in registry.pillars.items():
+        queries = registry.queries_for(name)
+        news_score = round(sum(query_scores[q["id"]] for q in queries) / len(queries), 1) if queries else None
+        if not pillar.get("feed"):
+            live_inputs[name] = news_score
+            continue
+        # HYBRID SCORING: take the HIGHER of the feed and news risk (Safety Protocol)
+        feed_score = feed_scores[pillar["feed"]]
+        live_inputs[name] = feed_score if news_score is None else max(feed_score, news_score)
+        at_least = CLAMP_RULES.get(name, {}).get("at_least")
+        if at_least and news_score is not None: driver_readings[at_least] = news_score
+    return live_inputs
 
-# --- 7. MASTER CALCULATOR ---
 def calculate_agri():
-    weights = {
-        "Geopolitical Conflict Intensity": 0.18, "Energy & Maritime Disruption": 0.15,
-        "Trade & Supply Chain Stress": 0.12, "Sovereign Financial Stress": 0.12,
-        "Currency & Liquidity Pressure": 0.10, "Sanctions & Regulatory Fragmentation": 0.10,
-        "Cyber & Infrastructure Threats": 0.10, "Climate & Resource Shock": 0.13
-    }
+    driver_readings.clear()
+    metrics.reset()
+    run_started = time.perf_counter()
     
     print("Initializing Avellon Intelligence Engine...")
+    if response_cache.MODE in ("record", "replay"):
+        # Image prompts are picked at random; pin them so replayed Pexels queries match the recording
+        random.seed(0)
+        print(f"HTTP mode: {response_cache.MODE} (fixtures in {response_cache.FIXTURE_DIR})")
+    dedup_index.load()
+    ctx = new_run_context()
+    sentiment.score_cache.load()
+    # Refreshes missing/expired image prompts in the background while the pillars are fetched
+    image_resolver.load().warm_async()
     
-    # HYBRID ENERGY SCORING
-    # 1. Get Financial Score
-    energy_price_score = fetch_energy_price_risk()
-    # 2. Get Geopolitical News Score for Energy
-    energy_news_score = fetch_newsdata_risk("oil OR energy OR maritime OR tanker OR strait", 50.0)
-    # 3. Take the HIGHER risk (Safety Protocol)
-    final_energy_score = max(energy_price_score, energy_news_score)
-
-    live_inputs = {
-        "Geopolitical Conflict Intensity": fetch_newsdata_risk("war OR conflict OR military OR troops", 70.0), 
-        "Energy & Maritime Disruption": final_energy_score,    
-        "Trade & Supply Chain Stress": fetch_newsdata_risk("supply chain OR port OR cargo OR logistics", 60.0),     
-        "Sovereign Financial Stress": fetch_sovereign_risk(),   
-        "Currency & Liquidity Pressure": fetch_currency_risk(), 
-        "Sanctions & Regulatory Fragmentation": fetch_newsdata_risk("sanctions OR tariffs OR embargo OR trade war", 55.0), 
-        "Cyber & Infrastructure Threats": fetch_newsdata_risk("cyberattack OR ransomware OR hack OR data breach", 50.0),       
-        "Climate & Resource Shock": fetch_climate_risk()        
-    }
+    # Only due queries/feeds are fetched, within each API's token bucket; the rest keep their last score
+    plan = scheduler.load().plan()
+    print(f"Scheduler: {scheduler.summary()}")
+
+    started = time.monotonic()
+    deadline = lambda source: started + SOURCE_DEADLINES[source]
+    # Sockets also carry the source timeout, so an abandoned worker cannot outlive its deadline for long
+    pool = ThreadPoolExecutor(max_workers=FETCH_WORKERS)
+    try:
+        # Network calls run in parallel; every source is awaited against its own deadline
+        # Pages past the first are fetched lazily while scoring, within the source's deadline and token bucket
+        take_page = lambda source: lambda: time.monotonic() < deadline(source) and scheduler.allow(source)
+        news_futures = [pool.submit(fetch_newsdata_articles, registry.query_string(req["terms"]),
+                                    registry.news_limits(req["source"])[0], take_page(req["source"]))
+                        for req in plan["news"]]
+        feed_futures = {f: pool.submit(FEED_FUNCTIONS[f][0]) for f in plan["feeds"]}
+
+        # Articles stream into scoring in registry order, as a serial run would, so dedup and alert order are stable
+        routed = {}
+        for req, future in zip(plan["news"], news_futures):
+            results = await_source(future, deadline(req["source"]), None, registry.query_string(req["terms"]), "fetch_newsdata_articles")
+            if results is not None: routed.update(route(results, req["members"]))
+        query_scores = {}
+        for q in registry.queries:
+            if q["id"] in routed:
+                query_scores[q["id"]] = score_newsdata_articles(ctx, registry.query_string(q["terms"]), routed[q["id"]], q["baseline"],
+                                                                registry.news_limits(q["source"])[1])
+                scheduler.record(q["id"], query_scores[q["id"]])
+            else:
+                last = scheduler.last_score(q["id"])
+                query_scores[q["id"]] = q["baseline"] if last is None else last
+
+        feed_scores = gather_feed_scores(feed_futures, deadline)
+        live_inputs = combine_pillars(query_scores, feed_scores)
+
+        # Only prompts that were cold in the cache wait on the warm-up, and only until this deadline
+        with metrics.stage("images.wait"): resolve_pending_images(ctx, time.monotonic() + SOURCE_DEADLINES["pexels"])
+    finally:
+        pool.shutdown(wait=False, cancel_futures=True)
+    metrics.add_stage("fetch", time.monotonic() - started)
     
+    # This run's stories now count as alerted for the next run (publish saves the index)
+    ctx.commit()
+    current_agri = publish(live_inputs, alert_store.load().merge(ctx.alerts.ranked()))
+    # The warm thread is a daemon thread: give it a bounded window to finish and save before exit
+    with metrics.stage("images.flush"):
+        if not image_resolver.wait(SOURCE_DEADLINES["pexels"]): image_resolver.save()
+    http_client.close_all()
+    metrics.add_stage("total", time.perf_counter() - run_started)
+    metrics.write()
+    print(metrics.summary())
+    print(f"Success. Score: {current_agri}")
+
+def publish(live_inputs, alerts):
+    """Composite score, narrative, persisted state and every output file for one set of pillar scores.
+    alerts is every live alert, newest first (see alert_store); the top 40 by severity are shown, arrival
+    order breaking ties. Returns the AGRI score."""
+    weights = PILLAR_WEIGHTS
     current_agri = round(sum(live_inputs[p] * weights[p] for p in weights), 1)
     
     # Prepare AI Context
-    severity_map = {"HIGH": 3, "MEDIUM": 2, "WATCH": 1}
-    global_alerts.sort(key=lambda x: severity_map.get(x["severity"], 0), reverse=True)
-    final_alerts = global_alerts[:40] if global_alerts else [{"title": "Global Markets Baseline Monitoring", "severity": "WATCH", "image": None, "url": "#"}]
+    final_alerts = top_alerts(alerts, TOP_ALERTS) or [{"title": "Global Markets Baseline Monitoring", "severity": "WATCH", "image": None, "url": "#"}]
     
     headlines_context = " | ".join([f"{a['title']} (Severity: {a['severity']})" for a in final_alerts[:20]])
     
@@ -272,14 +462,26 @@ def calculate_agri():
     """
     
     print("Generating Strategic Narrative...")
-    ai_response = call_gemini(prompt)
+    # Skips Gemini when the pillars and headlines are effectively the same as the last narrative's
+    headlines = [a["title"] for a in final_alerts[:20]]
+    with metrics.stage("narrative"):
+        ai_response = narrative_cache.load().get_or_generate(live_inputs, headlines, lambda: call_gemini(prompt))
+    print(f"Narrative cache: {narrative_cache.summary()}")
+    with metrics.stage("write.state"):
+        narrative_cache.save()
+        alert_store.save()
+        scheduler.save()
+        dedup_index.save()
+        sentiment.score_cache.save()
+        image_resolver.save()
+    print(f"Sentiment cache: {sentiment.score_cache.summary()}")
     
     current_time_str = datetime.datetime.utcnow().isoformat() + "Z"
     
     # Velocity & Save
-    try:
-        with open("data.json", "r") as f: previous = json.load(f).get("AGRI_Score", current_agri)
-    except: previous = current_agri
+    if not history.exists(): history.import_legacy()
+    last = history.latest()
+    previous = last["score"] if last else current_agri
     vel = round(current_agri - previous, 1)
     str_vel = f"+{vel}" if vel > 0 else str(vel)
 
@@ -292,18 +494,38 @@ def calculate_agri():
         "Last_Updated": current_time_str
     }
     
-    with open("data.json", "w") as f: json.dump(agri_data, f, indent=4)
-    
-    hist = []
-    if os.path.exists("history.json"):
-        try:
-            with open("history.json", "r") as f: hist = json.load(f)
-        except: pass
-    hist.append({"timestamp": current_time_str, "score": current_agri})
-    if len(hist) > 3000: hist = hist[-3000:]
-    with open("history.json", "w") as f: json.dump(hist, f, indent=4)
+    # Legacy single-file bundle; the dashboard itself reads the split parts in feed/
+    with metrics.stage("write.data_json"):
+        with open("data.json", "w") as f: json.dump(agri_data, f, separators=(",", ":"))
     
-    print(f"Success. Score: {current_agri}")
+    # One appended line per run; history.json is only a fallback export for the dashboard chart
+    with metrics.stage("write.history"):
+        history.append(current_time_str, current_agri, live_inputs, dict(driver_readings))
+        # The capped history.json fallback is refreshed on the first run of each UTC day, not every run
+        if last is None or last["timestamp"][:10] != current_time_str[:10] or not os.path.exists(history_store.LEGACY_PATH):
+            history.export_json()
+    # The dashboard chart reads these per-timeframe series instead of the whole history
+    with metrics.stage("write.series"): chart_series.update_series(current_time_str, current_agri, history)
+    series_files = [os.path.join(chart_series.SERIES_DIR, f"{tf}.json") for tf in chart_series.TIMEFRAMES]
+    with metrics.stage("write.artifacts"): artifacts.write_dashboard(agri_data, extra_files=series_files)
+    return current_agri
+
+# --- 9. COLD START REPORT ---
+IMPORT_SECONDS = round(time.perf_counter() - _import_started, 4)
+
+def startup_report():
+    """Import cost of the engine plus the one-off sentiment model load, for tracking cold-start regressions."""
+    sentiment.get_analyzer()
+    return {"import_seconds": IMPORT_SECONDS, "sentiment_load_seconds": sentiment.load_info["seconds"],
+            "lexicon": sentiment.load_info["lexicon"]}
 
 if __name__ == "__main__":
-    calculate_agri()
+    if "--startup-report" in sys.argv:
+        print(json.dumps(startup_report()))
+    else:
+        # --profile (or AGRI_PROFILE=1) also writes a cProfile dump next to the run metrics
+        with profiled("--profile" in sys.argv or os.environ.get("AGRI_PROFILE") == "1"): calculate_agri()
+        if sentiment.load_info["seconds"] is None:
+            print(f"Cold start: import {IMPORT_SECONDS}s, sentiment model not loaded (no articles scored)")
+        else:
+            print(f"Cold start: import {IMPORT_SECONDS}s, sentiment model {sentiment.load_info['seconds']}s ({sentiment.load_info['lexicon']})")
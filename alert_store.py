@@ -0,0 +1,45 @@
+# AVELLON ALERT STORE
+# The dedup index lets a story alert only once, but the dashboard's alert feed
+# is a full snapshot. Published alerts are therefore kept between runs: each
+# run's new alerts go in front of the ones already published, and an alert
+# drops out after ALERT_TTL or once more than MAX_ALERTS newer ones arrive.
+# ALERT_TTL matches the dedup index's TTL, which runs from a story's first
+# sighting: a story still in the news when its alert expires is no longer in
+# the index on that run, so it alerts again and the dashboard keeps it.
+
+import json
+import os
+import time
+
+CACHE_DIR = os.environ.get("AGRI_CACHE_DIR", ".agri_cache")
+ALERTS_PATH = os.path.join(CACHE_DIR, "published_alerts.json")
+MAX_ALERTS = 200
+ALERT_TTL = 24 * 3600
+
+class AlertStore:
+    def __init__(self, path=ALERTS_PATH, max_alerts=MAX_ALERTS, ttl=ALERT_TTL):
+        self.path = path
+        self.max_alerts = max_alerts
+        self.ttl = ttl
+        self.entries = []    # [{"alert", "ts"}], newest first
+
+    def load(self):
+        try:
+            with open(self.path, "r") as f: self.entries = json.load(f)
+        except (OSError, ValueError): self.entries = []
+        return self
+
+    def save(self):
+        os.makedirs(os.path.dirname(self.path) or ".", exist_ok=True)
+        with open(self.path + ".tmp", "w") as f: json.dump(self.entries, f, separators=(",", ":"))
+        os.replace(self.path + ".tmp", self.path)
+
+    def merge(self, fresh, now=None):
+        """Puts this run's new alerts in front of the unexpired published ones; returns all of them, newest first."""
+        now = now or time.time()
+        kept = [e for e in self.entries if now - e["ts"] <= self.ttl]
+        self.entries = ([{"alert": alert, "ts": now} for alert in fresh] + kept)[:self.max_alerts]
+        return self.alerts()
+
+    def alerts(self):
+        return [e["alert"] for e in self.entries]
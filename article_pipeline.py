@@ -0,0 +1,148 @@
+# AVELLON ARTICLE PIPELINE
+# News articles stream through lazy generator stages, one at a time:
+#   normalise -> dedup -> classify -> sentiment -> alerts (+ image lookup)
+# Per-run state (run id, the run's own seen stories, ranked alerts, images
+# still waiting on the warm-up) lives on a RunContext rather than in module
+# globals, so several scoring runs (e.g. one per region) can share a process.
+# The shared dedup index only holds committed runs' stories. Memory is bounded
+# by the sentiment chunk and the alert heap, not by how many articles a query
+# yields.
+
+import heapq
+import itertools
+
+import sentiment
+import taxonomy
+from dedup_index import DedupIndex
+from instrumentation import metrics
+
+SEVERITY_RANK = {"HIGH": 3, "MEDIUM": 2, "WATCH": 1}
+TOP_ALERTS = 40
+# Texts scored per sentiment.score_batch call
+SENTIMENT_CHUNK = 64
+
+class TopAlerts:
+    """Bounded min-heap keeping the highest-severity alerts. Ties go to the earlier arrival,
+    so ranked() equals a stable severity sort of everything pushed, cut to limit."""
+
+    def __init__(self, limit=TOP_ALERTS):
+        self.limit = limit
+        self._heap = []              # (rank, -arrival, alert); the root is the next to evict
+        self._arrivals = itertools.count()
+
+    def push(self, alert):
+        """Adds alert; returns whichever alert did not make the cut (possibly alert itself), or None."""
+        item = (SEVERITY_RANK.get(alert["severity"], 0), -next(self._arrivals), alert)
+        if len(self._heap) < self.limit:
+            heapq.heappush(self._heap, item)
+            return None
+        if item[:2] < self._heap[0][:2]: return alert
+        return heapq.heapreplace(self._heap, item)[2]
+
+    def extend(self, alerts):
+        for alert in alerts: self.push(alert)
+        return self
+
+    def ranked(self):
+        return [alert for _, _, alert in sorted(self._heap, key=lambda item: item[:2], reverse=True)]
+
+    def __iter__(self):
+        return iter(self.ranked())
+
+    def __len__(self):
+        return len(self._heap)
+
+def top_alerts(alerts, limit=TOP_ALERTS):
+    """The limit highest-severity alerts of any iterable, most severe first, arrival order breaking ties."""
+    return TopAlerts(limit).extend(alerts).ranked()
+
+class RunContext:
+    """State of one scoring run. dedup is the DedupIndex shared across runs, consulted read-only until
+    commit(); images an ImageResolver; pick_prompt(category) -> image prompt."""
+
+    def __init__(self, run_id, dedup, images, pick_prompt, max_alerts=TOP_ALERTS):
+        self.run_id = run_id
+        self.dedup = dedup
+        self.seen = DedupIndex(path=None)   # this run's stories; in memory only
+        self.images = images
+        self.pick_prompt = pick_prompt
+        self.alerts = TopAlerts(max_alerts)
+        self.pending_images = {}     # id(alert) -> (alert, prompt, category) for kept alerts with a cold prompt
+
+    def commit(self):
+        """Records this run's stories in the shared index, so later runs treat them as already alerted."""
+        for entry in self.seen.entries.values():
+            self.dedup.record(entry["title"], now=entry["ts"], run=self.run_id)
+
+    def add_alert(self, alert, prompt=None, category=None):
+        if prompt is not None: self.pending_images[id(alert)] = (alert, prompt, category)
+        dropped = self.alerts.push(alert)
+        if dropped is not None: self.pending_images.pop(id(dropped), None)
+
+    def take_pending_images(self):
+        queued = list(self.pending_images.values())
+        self.pending_images.clear()
+        return queued
+
+# --- STAGES ---
+def normalise(articles):
+    for article in articles:
+        title = article.get('title', '')
+        desc = article.get('description') or ''
+        yield {"title": title, "text": f"{title} {desc}", "url": article.get('link', '#'),
+               "image": article.get('image_url'), "source": article.get('source_id', 'Global News')}
+
+def dedup(ctx, items):
+    """Drops repeats within this run; stories a committed run already alerted pass with fresh=False."""
+    for item in items:
+        with metrics.stage("dedup"):
+            repeat = ctx.seen.lookup(item["title"]) is not None
+            if not repeat:
+                ctx.seen.record(item["title"], run=ctx.run_id)
+                item["fresh"] = ctx.dedup.lookup(item["title"]) is None
+        if not repeat: yield item
+
+def classify(items):
+    # One taxonomy pass gives both the severity and the image category
+    for item in items:
+        with metrics.stage("classify"): item["severity"], item["category"] = taxonomy.classify(item["text"])
+        yield item
+
+def score_sentiment(items, chunk=SENTIMENT_CHUNK):
+    """Scores sentiment a chunk at a time; cached texts cost a hash lookup."""
+    while True:
+        batch = list(itertools.islice(items, chunk))
+        if not batch: return
+        with metrics.stage("sentiment"): compounds = sentiment.score_batch([item["text"] for item in batch])
+        for item, compound in zip(batch, compounds):
+            item["compound"] = compound
+            yield item
+
+def alerts(ctx, items):
+    """Alerts fresh stories. Images come from the local image cache; cold prompts wait on ctx.pending_images."""
+    for item in items:
+        if item["fresh"]:
+            alert = {"title": item["title"], "severity": item["severity"], "url": item["url"],
+                     "image": item["image"], "source": item["source"]}
+            prompt = None
+            if not alert["image"]:
+                prompt = ctx.pick_prompt(item["category"])
+                alert["image"] = ctx.images.lookup(prompt, item["category"])
+                if alert["image"]: prompt = None
+            ctx.add_alert(alert, prompt, item["category"])
+        yield item
+
+def risk_modifier(item):
+    modifier = 0
+    if item["compound"] < -0.2: modifier += 1.2
+    elif item["compound"] > 0.2: modifier -= 0.5
+    if item["severity"] == "HIGH": modifier += 2.0
+    elif item["severity"] == "MEDIUM": modifier += 0.8
+    return modifier
+
+def score_articles(ctx, articles, baseline_score, limit=None):
+    """News pillar score from any iterable of raw articles (limit=None consumes it all), in arrival order."""
+    articles = itertools.islice(articles, limit)
+    items = alerts(ctx, score_sentiment(classify(dedup(ctx, normalise(articles)))))
+    modifier = sum(risk_modifier(item) for item in items)
+    return round(min(max(baseline_score + modifier, 20), 100), 1)
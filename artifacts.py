@@ -0,0 +1,62 @@
+# AVELLON DASHBOARD ARTIFACTS
+# Splits the run output into small minified parts (score summary, narratives,
+# alerts), writes precompressed .gz / .br siblings for servers that can serve
+# them directly, and publishes a content-hash manifest. The dashboard fetches
+# only the tiny manifest each load and re-downloads a part only when its hash
+# has changed.
+
+import gzip
+import hashlib
+import json
+import os
+
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+FEED_DIR = "feed"
+
+PARTS = {
+    "summary": ["AGRI_Score", "Velocity", "Top_Risk_Driver", "Pillar_Scores", "Last_Updated"],
+    "narratives": ["AI_Brief", "Pillar_Narratives"],
+    "alerts": ["All_Alerts"],
+}
+
+def minify(obj):
+    return json.dumps(obj, separators=(",", ":"), ensure_ascii=False).encode("utf-8")
+
+def content_hash(data):
+    return hashlib.sha256(data).hexdigest()[:16]
+
+def _write_bytes(path, data):
+    os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+    with open(path + ".tmp", "wb") as f: f.write(data)
+    os.replace(path + ".tmp", path)
+
+def write_part(path, data):
+    """Writes data plus compressed siblings. Returns its manifest entry."""
+    _write_bytes(path, data)
+    # mtime=0 keeps the .gz byte-identical for identical content
+    _write_bytes(path + ".gz", gzip.compress(data, compresslevel=9, mtime=0))
+    entry = {"file": path.replace(os.sep, "/"), "hash": content_hash(data), "bytes": len(data)}
+    if brotli is not None:
+        _write_bytes(path + ".br", brotli.compress(data, quality=11))
+    return entry
+
+def write_dashboard(agri_data, extra_files=(), feed_dir=FEED_DIR):
+    """Writes the split dashboard payloads and the manifest. extra_files are already-written
+    JSON files (e.g. chart series) that get compressed siblings and a manifest entry too."""
+    parts = {}
+    for name, keys in PARTS.items():
+        payload = {k: agri_data[k] for k in keys if k in agri_data}
+        parts[name] = write_part(os.path.join(feed_dir, f"{name}.json"), minify(payload))
+    for path in extra_files:
+        try:
+            with open(path, "rb") as f: data = f.read()
+        except OSError:
+            continue
+        parts[os.path.splitext(path)[0].replace(os.sep, "/")] = write_part(path, data)
+    manifest = {"generated": agri_data.get("Last_Updated"), "parts": parts}
+    _write_bytes(os.path.join(feed_dir, "manifest.json"), minify(manifest))
+    return manifest
@@ -0,0 +1,208 @@
+# AVELLON BACKTEST ENGINE
+# Replays history.jsonl under alternative pillar weights and clamp rules.
+# History is loaded once into arrays (runs x pillars, runs x drivers), and
+# every recomputation is a matrix operation: a sweep over thousands of weight
+# vectors is one (runs x pillars) @ (pillars x candidates) product per chunk,
+# with no Python loop over individual points.
+#
+#   python backtest.py --candidates 5000 --spread 0.3
+#
+# NumPy is optional for the engine itself and only needed here.
+
+import argparse
+import json
+import sys
+import time
+
+try:
+    import numpy as np
+except ImportError:
+    np = None
+
+from agri_engine import CLAMP_RULES, PILLAR_WEIGHTS
+from history_store import HistoryStore, to_epoch
+
+PILLARS = list(PILLAR_WEIGHTS)
+# Largest runs x candidates block materialised at once (float64: 8 bytes per cell)
+CHUNK_CELLS = 4_000_000
+
+def _require_numpy():
+    if np is None:
+        raise RuntimeError("backtest.py needs numpy: pip install numpy")
+
+class History:
+    """Per-run arrays loaded from the history store. Runs without pillar scores (pre-jsonl imports) are skipped."""
+
+    def __init__(self, epochs, scores, pillars, drivers, driver_names):
+        self.epochs = epochs            # (runs,)
+        self.scores = scores            # (runs,) composite as published
+        self.pillars = pillars          # (runs, pillars) in PILLARS order
+        self.drivers = drivers          # (runs, drivers), NaN where a run has no reading
+        self.driver_names = driver_names
+
+    def __len__(self):
+        return len(self.epochs)
+
+def load_history(store=None, start=None, end=None):
+    _require_numpy()
+    store = store or HistoryStore()
+    driver_names = sorted({rule["driver"] for rule in CLAMP_RULES.values()} |
+                          {rule["at_least"] for rule in CLAMP_RULES.values() if rule.get("at_least")})
+    epochs, scores, pillars, drivers = [], [], [], []
+    for record in store.range(start, end):
+        if not record.get("pillars") or any(p not in record["pillars"] for p in PILLARS): continue
+        epochs.append(to_epoch(record["timestamp"]))
+        scores.append(record["score"])
+        pillars.append([record["pillars"][p] for p in PILLARS])
+        readings = record.get("drivers", {})
+        drivers.append([readings.get(d, np.nan) for d in driver_names])
+    return History(np.array(epochs, dtype=float), np.array(scores, dtype=float),
+                   np.array(pillars, dtype=float).reshape(-1, len(PILLARS)),
+                   np.array(drivers, dtype=float).reshape(-1, len(driver_names)), driver_names)
+
+def apply_rules(history, rules=None):
+    """Pillar matrix recomputed under alternative clamp rules ({pillar: partial rule} overrides of CLAMP_RULES).
+
+    Runs that stored the raw reading are recomputed from it exactly. Older runs only have the clamped score,
+    so for them the new floor/ceiling is applied to the stored value (exact for tighter bounds)."""
+    _require_numpy()
+    pillars = history.pillars.copy()
+    for pillar, override in (rules or {}).items():
+        rule = dict(CLAMP_RULES[pillar], **override)
+        col = PILLARS.index(pillar)
+        reading = history.drivers[:, history.driver_names.index(rule["driver"])]
+        deviation = np.abs(reading - rule["center"]) if rule.get("abs") else reading - rule["center"]
+        from_reading = np.round(np.clip(rule["base"] + (deviation * rule["slope"]), rule["floor"], rule["ceiling"]), 1)
+        if rule.get("at_least"):
+            floor_score = history.drivers[:, history.driver_names.index(rule["at_least"])]
+            from_reading = np.where(np.isnan(floor_score), from_reading, np.fmax(from_reading, floor_score))
+        reclipped = np.clip(pillars[:, col], rule["floor"], rule["ceiling"])
+        pillars[:, col] = np.where(np.isnan(reading), reclipped, from_reading)
+    return pillars
+
+def weight_matrix(weights):
+    """(candidates, pillars) array from a weights dict, a list of dicts, or an array; rows are normalised to sum to 1."""
+    _require_numpy()
+    if isinstance(weights, dict): weights = [weights]
+    if isinstance(weights, list) and weights and isinstance(weights[0], dict):
+        weights = [[w.get(p, 0.0) for p in PILLARS] for w in weights]
+    w = np.atleast_2d(np.asarray(weights, dtype=float))
+    return w / w.sum(axis=1, keepdims=True)
+
+def random_weights(n, spread=0.3, seed=0, base=None):
+    """n weight vectors drawn from a Dirichlet centred on the production weights; spread ~ relative std."""
+    _require_numpy()
+    base = weight_matrix(base or PILLAR_WEIGHTS)[0]
+    concentration = max(1.0 / (spread ** 2), 1.0)
+    return np.random.default_rng(seed).dirichlet(base * concentration, size=n)
+
+def composite(pillars, weights):
+    """AGRI series (runs, candidates) for each weight vector, rounded like the engine."""
+    return np.round(pillars @ weight_matrix(weights).T, 1)
+
+def sweep(history, weights, rules=None, chunk_cells=CHUNK_CELLS):
+    """Drift of each candidate's AGRI series against the production series.
+
+    Returns {"weights", "mean", "std", "max", "mean_abs_drift", "max_abs_drift", "rmse", "corr", "final"},
+    one entry per candidate, computed on unrounded series. Moments come from the pillar mean vector and
+    covariance matrix (pillars x pillars), so only the absolute-drift statistics touch a full
+    runs x candidates block, and those are built in chunks so memory stays bounded."""
+    _require_numpy()
+    pillars = apply_rules(history, rules)
+    w = weight_matrix(weights)
+    w0 = weight_matrix(PILLAR_WEIGHTS)[0]
+    runs = len(history)
+    if not runs:
+        out = {k: np.full(len(w), np.nan) for k in ("mean", "std", "max", "mean_abs_drift", "max_abs_drift", "rmse", "corr", "final")}
+        out["weights"] = w
+        return out
+    baseline = history.pillars @ w0
+    mean = pillars.mean(axis=0)
+    cov = np.cov(pillars, rowvar=False, bias=True)
+    # Candidates vs the production series, which may use different clamp rules
+    cross = (pillars - mean).T @ (baseline - baseline.mean()) / runs
+    variance = np.einsum("ij,jk,ik->i", w, cov, w)
+    bias = w @ mean - baseline.mean()
+    drift_var = variance - 2 * (w @ cross) + baseline.var()
+    out = {
+        "mean": w @ mean,
+        "std": np.sqrt(np.maximum(variance, 0)),
+        "rmse": np.sqrt(np.maximum(drift_var + bias ** 2, 0)),
+        "final": w @ pillars[-1],
+        "max": np.empty(len(w)), "mean_abs_drift": np.empty(len(w)), "max_abs_drift": np.empty(len(w)),
+    }
+    with np.errstate(invalid="ignore", divide="ignore"):
+        out["corr"] = (w @ cross) / (out["std"] * baseline.std())
+    step = max(chunk_cells // runs, 1)
+    for lo in range(0, len(w), step):
+        s = slice(lo, lo + step)
+        series = pillars @ w[s].T                   # (runs, chunk)
+        out["max"][s] = series.max(axis=0)
+        series -= baseline[:, None]
+        np.abs(series, out=series)
+        out["mean_abs_drift"][s] = series.mean(axis=0)
+        out["max_abs_drift"][s] = series.max(axis=0)
+    out["weights"] = w
+    return out
+
+def sensitivity(history, weights=None, rules=None):
+    """Per pillar: change in the AGRI series when that pillar's weight rises by 0.01 (others rescaled).
+
+    With renormalised weights, d(AGRI)/d(w_p) = pillar_p - AGRI, so the whole table is one broadcast."""
+    _require_numpy()
+    pillars = apply_rules(history, rules)
+    w = weight_matrix(weights or PILLAR_WEIGHTS)[0]
+    agri = pillars @ w
+    effect = (pillars - agri[:, None]) * 0.01
+    return {p: {"weight": round(float(w[i]), 4),
+                "mean_effect": round(float(effect[:, i].mean()), 4),
+                "max_abs_effect": round(float(np.abs(effect[:, i]).max()), 4),
+                "share_of_score": round(float((pillars[:, i] * w[i] / agri).mean()), 4)}
+            for i, p in enumerate(PILLARS)} if len(history) else {}
+
+def drift_summary(result, percentiles=(50, 90, 99)):
+    """Distribution of sweep drift statistics across all candidates."""
+    summary = {}
+    for key in ("mean_abs_drift", "max_abs_drift", "rmse", "corr"):
+        values = result[key][~np.isnan(result[key])]
+        summary[key] = {f"p{q}": round(float(np.percentile(values, q)), 3) for q in percentiles} if values.size else {}
+    worst = int(np.nanargmax(result["max_abs_drift"])) if len(result["max_abs_drift"]) and not np.isnan(result["max_abs_drift"]).all() else None
+    if worst is not None:
+        summary["worst_candidate"] = {"weights": dict(zip(PILLARS, np.round(result["weights"][worst], 4).tolist())),
+                                      "max_abs_drift": round(float(result["max_abs_drift"][worst]), 2)}
+    return summary
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Weight and clamp-rule backtest over history.jsonl")
+    parser.add_argument("--history", default=None, help="path to history.jsonl")
+    parser.add_argument("--start", default=None)
+    parser.add_argument("--end", default=None)
+    parser.add_argument("--candidates", type=int, default=2000)
+    parser.add_argument("--spread", type=float, default=0.3)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--rules", default=None, help='JSON overrides, e.g. {"Sovereign Financial Stress": {"ceiling": 90}}')
+    args = parser.parse_args(argv)
+
+    started = time.perf_counter()
+    history = load_history(HistoryStore(args.history) if args.history else None, args.start, args.end)
+    loaded = time.perf_counter()
+    if not len(history):
+        print("No history records with pillar scores to backtest.")
+        return 1
+    rules = json.loads(args.rules) if args.rules else None
+    result = sweep(history, random_weights(args.candidates, args.spread, args.seed), rules)
+    report = {
+        "runs": len(history),
+        "with_drivers": int((~np.isnan(history.drivers)).any(axis=1).sum()),
+        # How well the stored pillars reproduce the published composite under PILLAR_WEIGHTS
+        "reproduction_error": round(float(np.abs(composite(history.pillars, PILLAR_WEIGHTS)[:, 0] - history.scores).max()), 2),
+        "candidates": args.candidates,
+        "sensitivity": sensitivity(history, rules=rules),
+        "drift": drift_summary(result),
+        "seconds": {"load": round(loaded - started, 3), "sweep": round(time.perf_counter() - loaded, 3)},
+    }
+    print(json.dumps(report, indent=2))
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,344 @@
+# AVELLON BENCHMARK SUITE
+# Offline timings for the engine's hot paths: the article pipeline's dedup stage, risk
+# classification, image query selection, sentiment scoring, and a full
+# calculate_agri() run. Synthetic corpora scale from 10 to 100k headlines.
+# Upstream APIs are served by a local stub server (recorded fixtures when
+# present, synthetic responses otherwise), so nothing leaves the machine and
+# no API quota is spent.
+#
+#   python benchmarks.py --output bench.json
+#   python benchmarks.py --quick --compare bench.json      # exits 1 on a regression
+
+import argparse
+import contextlib
+import gzip
+import hashlib
+import io
+import json
+import os
+import platform
+import random
+import shutil
+import statistics
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+import urllib.parse
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+# Engine modules read these at import time, so the sandbox is set up before importing them
+WORK_DIR = tempfile.mkdtemp(prefix="agri-bench-")
+os.environ["AGRI_CACHE_DIR"] = os.path.join(WORK_DIR, "cache")
+os.environ["AGRI_HTTP_MODE"] = "live"
+for _key in ("NEWSDATA_API_KEY", "ALPHA_VANTAGE_KEY", "PEXELS_API_KEY", "GEMINI_API_KEY"):
+    os.environ[_key] = "bench"
+
+import agri_engine
+import article_pipeline
+import http_client
+import response_cache
+import sentiment
+from dedup_index import DedupIndex
+
+REPO_DIR = os.path.dirname(os.path.abspath(__file__))
+DEFAULT_SIZES = (10, 100, 1000, 10000, 100000)
+QUICK_SIZES = (10, 100, 1000)
+DEFAULT_OUTPUT = "benchmark_results.json"
+# Differences below this are timer noise, never a regression
+NOISE_FLOOR_SECONDS = 0.002
+
+# --- SYNTHETIC CORPORA ---
+_SUBJECTS = ["Oil tanker", "Naval convoy", "Central bank", "Port authority", "Ransomware gang", "Grain exporter",
+             "Chip maker", "Pipeline operator", "Defense ministry", "Shipping line", "Power grid", "Trade envoy"]
+_EVENTS = ["seized near", "attacked off", "warns of crisis in", "imposes sanctions on", "halts cargo at",
+           "reports outage across", "raises tariffs on", "deploys troops to", "signs deal with", "flags drought in"]
+_PLACES = ["Strait of Hormuz", "Red Sea", "Taiwan Strait", "Black Sea", "Panama Canal", "Rotterdam",
+           "Singapore", "Suez", "Baltic states", "Gulf of Aden", "Shanghai", "Houston"]
+_TAILS = ["as markets react", "amid rising tension", "after talks stall", "officials say", "analysts warn",
+          "in overnight raid", "for second week", "despite ceasefire", "", ""]
+_PROSE = ("officials noted that regional partners would continue to assess the outlook after weekend discussions "
+          "with analysts lenders exporters and insurers while prices moved sharply lower in thin trading").split()
+
+def synthetic_headlines(n, seed=0, duplicate_rate=0.1):
+    """n headlines; about duplicate_rate of them are syndicated near-copies of an earlier one."""
+    rng = random.Random(seed)
+    out = []
+    for i in range(n):
+        if out and rng.random() < duplicate_rate:
+            original = rng.choice(out)
+            out.append(rng.choice([original.upper(), original + " - Reuters", original.replace(" ", "  "), original + "!"]))
+        else:
+            out.append(f"{rng.choice(_SUBJECTS)} {rng.choice(_EVENTS)} {rng.choice(_PLACES)} {rng.choice(_TAILS)} #{i}".strip())
+    return out
+
+def synthetic_articles(n, seed=0):
+    rng = random.Random(seed)
+    return [{"title": title, "description": " ".join(rng.choice(_PROSE) for _ in range(rng.randint(15, 40))),
+             "link": f"https://news.example/{seed}/{i}", "image_url": None if rng.random() < 0.6 else f"https://img.example/{i}.jpg",
+             "source_id": rng.choice(["reuters", "bbc", "ap", "ft"])}
+            for i, title in enumerate(synthetic_headlines(n, seed))]
+
+# --- STUB UPSTREAM SERVER ---
+PILLARS = list(agri_engine.PILLAR_WEIGHTS)
+PAGE_SIZE = 10
+STUB_PAGES = 5
+
+def synthetic_response(host, path, query, body):
+    """Body for one upstream request, shaped like the real API's response."""
+    if host == "newsdata.io":
+        seed = int(hashlib.sha1(query.get("q", [""])[0].encode("utf-8")).hexdigest()[:8], 16)
+        # Pages of PAGE_SIZE chained through a nextPage cursor, like the real API
+        page = int(query.get("page", ["1"])[0])
+        return {"status": "success", "results": synthetic_articles(PAGE_SIZE, seed + page - 1),
+                "nextPage": str(page + 1) if page < STUB_PAGES else None}
+    if host == "www.alphavantage.co":
+        value = {"BRENT": "82.40", "TREASURY_YIELD": "4.31"}.get(query.get("function", [""])[0], "0")
+        return {"data": [{"date": "2026-01-02", "value": value}]}
+    if host == "api.frankfurter.app":
+        return {"amount": 1.0, "base": "USD", "rates": {"EUR": 0.92, "GBP": 0.79, "JPY": 151.2}}
+    if host == "earthquake.usgs.gov":
+        return {"features": [{"properties": {"mag": m}} for m in (4.6, 5.1, 5.9, 6.3, 4.8)]}
+    if host == "api.pexels.com":
+        digest = hashlib.sha1(query.get("query", [""])[0].encode("utf-8")).hexdigest()[:12]
+        return {"photos": [{"src": {"medium": f"https://images.pexels.com/photos/stub/{digest}.jpeg"}}]}
+    if host == "generativelanguage.googleapis.com":
+        narrative = {"main_brief": "Benchmark brief citing stub headlines.",
+                     "pillar_narratives": {p: "Benchmark narrative." for p in PILLARS}}
+        return {"candidates": [{"content": {"parts": [{"text": json.dumps(narrative)}]}}]}
+    return None
+
+class StubHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+    latency = 0.0
+    fixture_dir = None
+    counts = {}
+
+    def _respond(self):
+        length = int(self.headers.get("Content-Length") or 0)
+        body = self.rfile.read(length) if length else None
+        host = (self.headers.get("Host") or "").split(":")[0]
+        parts = urllib.parse.urlsplit(self.path)
+        StubHandler.counts[host] = StubHandler.counts.get(host, 0) + 1
+        if self.latency: time.sleep(self.latency)
+
+        payload = None
+        if self.fixture_dir:
+            # Fixtures written by AGRI_HTTP_MODE=record are keyed by the redacted request
+            key = response_cache.request_key(self.command, f"https://{self.headers.get('Host')}{self.path}", body)
+            try:
+                with open(os.path.join(self.fixture_dir, key + ".json"), "r") as f: payload = json.load(f)["body"].encode("utf-8")
+            except (OSError, ValueError, KeyError): payload = None
+        if payload is None:
+            data = synthetic_response(host, parts.path, urllib.parse.parse_qs(parts.query), body)
+            if data is None:
+                self.send_response(404)
+                self.send_header("Content-Length", "0")
+                self.end_headers()
+                return
+            payload = json.dumps(data).encode("utf-8")
+
+        etag = '"' + hashlib.sha1(payload).hexdigest()[:16] + '"'
+        if self.headers.get("If-None-Match") == etag:
+            self.send_response(304)
+            self.send_header("ETag", etag)
+            self.send_header("Content-Length", "0")
+            self.end_headers()
+            return
+        self.send_response(200)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("ETag", etag)
+        if "gzip" in (self.headers.get("Accept-Encoding") or ""):
+            payload = gzip.compress(payload)
+            self.send_header("Content-Encoding", "gzip")
+        self.send_header("Content-Length", str(len(payload)))
+        self.end_headers()
+        self.wfile.write(payload)
+
+    do_GET = _respond
+    do_POST = _respond
+
+    def log_message(self, *args):
+        pass
+
+@contextlib.contextmanager
+def stub_server(latency=0.0, fixture_dir=None):
+    """Runs the stub on a free local port and routes http_client through it."""
+    StubHandler.latency, StubHandler.fixture_dir, StubHandler.counts = latency, fixture_dir, {}
+    server = ThreadingHTTPServer(("127.0.0.1", 0), StubHandler)
+    server.daemon_threads = True
+    thread = threading.Thread(target=server.serve_forever, name="bench-stub", daemon=True)
+    thread.start()
+    previous = http_client.HOST_OVERRIDE
+    http_client.HOST_OVERRIDE = f"http://127.0.0.1:{server.server_address[1]}"
+    try:
+        yield server
+    finally:
+        http_client.HOST_OVERRIDE = previous
+        http_client.close_all()
+        server.shutdown()
+        server.server_close()
+
+# --- BENCHMARKS ---
+def timed(fn, repeats):
+    """Runs fn repeats times and returns the per-run wall times in seconds."""
+    times = []
+    for _ in range(repeats):
+        started = time.perf_counter()
+        fn()
+        times.append(time.perf_counter() - started)
+    return times
+
+def repeats_for(size):
+    return 5 if size <= 1000 else 3 if size <= 10000 else 1
+
+def bench_dedup_stage(size):
+    """article_pipeline.dedup: the run's own seen index plus a lookup in a shared index that already
+    holds a committed run's half of the stories."""
+    articles = synthetic_articles(size, seed=size)
+    committed = DedupIndex(path=None)
+    for article in articles[::2]: committed.record(article["title"], run="earlier")
+    def run():
+        agri_engine.dedup_index = committed   # read-only here: the context is never committed
+        ctx = agri_engine.new_run_context()
+        for _ in article_pipeline.dedup(ctx, article_pipeline.normalise(articles)): pass
+    return run
+
+def bench_classify_risk_level(size):
+    texts = [f"{a['title']} {a['description']}" for a in synthetic_articles(size, seed=size)]
+    return lambda: [agri_engine.classify_risk_level(t) for t in texts]
+
+def bench_get_cinematic_query(size):
+    headlines = synthetic_headlines(size, seed=size)
+    return lambda: [agri_engine.get_cinematic_query(h) for h in headlines]
+
+def bench_score_articles(size):
+    """The whole article pipeline over one query's worth of articles, streamed from a generator."""
+    articles = synthetic_articles(size, seed=size)
+    def run():
+        agri_engine.dedup_index = DedupIndex(path=os.path.join(WORK_DIR, "bench_dedup.json"))
+        ctx = agri_engine.new_run_context()
+        agri_engine.score_newsdata_articles(ctx, "bench", iter(articles), 50.0, limit=None)
+    return run
+
+def bench_sentiment_cold(size):
+    texts = [f"{a['title']} {a['description']}" for a in synthetic_articles(size, seed=size)]
+    return lambda: sentiment.score_batch(texts, cache=sentiment.ScoreCache(max_entries=size))
+
+def bench_sentiment_warm(size):
+    texts = [f"{a['title']} {a['description']}" for a in synthetic_articles(size, seed=size)]
+    cache = sentiment.ScoreCache(max_entries=size)
+    sentiment.score_batch(texts, cache=cache)
+    return lambda: sentiment.score_batch(texts, cache=cache)
+
+SCALED_BENCHMARKS = {
+    "dedup_stage": bench_dedup_stage,
+    "classify_risk_level": bench_classify_risk_level,
+    "get_cinematic_query": bench_get_cinematic_query,
+    "score_articles": bench_score_articles,
+    "sentiment_cold": bench_sentiment_cold,
+    "sentiment_warm": bench_sentiment_warm,
+}
+
+def run_calculate_agri():
+    """One full engine run inside the sandbox, with fresh per-run engine state."""
+    agri_engine.dedup_index = DedupIndex()
+    cwd = os.getcwd()
+    os.chdir(WORK_DIR)
+    try:
+        with contextlib.redirect_stdout(io.StringIO()):
+            agri_engine.calculate_agri()
+    finally:
+        os.chdir(cwd)
+
+def bench_end_to_end(latency, fixture_dir, repeats):
+    """calculate_agri() against the stub: first with empty caches, then warm (response/narrative caches hit)."""
+    results = []
+    with stub_server(latency, fixture_dir) as server:
+        shutil.rmtree(os.environ["AGRI_CACHE_DIR"], ignore_errors=True)
+        cold = timed(run_calculate_agri, 1)
+        cold_requests = sum(StubHandler.counts.values())
+        warm = timed(run_calculate_agri, repeats)
+        results.append(result("calculate_agri_cold", 1, cold, requests=cold_requests))
+        results.append(result("calculate_agri_warm", 1, warm, requests=sum(StubHandler.counts.values()) - cold_requests))
+    return results
+
+def result(name, size, times, **extra):
+    seconds = statistics.median(times)
+    entry = {"name": name, "size": size, "seconds": round(seconds, 6), "min_seconds": round(min(times), 6),
+             "repeats": len(times), "per_item_us": round(seconds / size * 1e6, 3)}
+    entry.update(extra)
+    return entry
+
+# --- RESULTS & COMPARISON ---
+def environment():
+    try:
+        commit = subprocess.run(["git", "rev-parse", "--short", "HEAD"], cwd=REPO_DIR, capture_output=True, text=True, timeout=5).stdout.strip() or None
+    except (OSError, subprocess.SubprocessError):
+        commit = None
+    return {"python": platform.python_version(), "platform": platform.platform(), "machine": platform.machine(), "commit": commit}
+
+def compare(current, baseline, tolerance):
+    """Rows of (name, size, old, new, ratio, regressed) for every benchmark present in both runs.
+    Best-of-repeats times are compared; they are far less sensitive to machine noise than medians."""
+    old = {(r["name"], r["size"]): r for r in baseline["results"]}
+    rows = []
+    for r in current["results"]:
+        prev = old.get((r["name"], r["size"]))
+        if prev is None: continue
+        before, after = prev["min_seconds"], r["min_seconds"]
+        ratio = after / before if before else float("inf")
+        regressed = ratio > 1 + tolerance and after - before > NOISE_FLOOR_SECONDS
+        rows.append((r["name"], r["size"], before, after, ratio, regressed))
+    return rows
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Offline benchmarks for the AGRI engine")
+    parser.add_argument("--sizes", default=None, help="comma-separated corpus sizes (default 10..100000)")
+    parser.add_argument("--quick", action="store_true", help=f"sizes {QUICK_SIZES} only")
+    parser.add_argument("--only", default=None, help="comma-separated benchmark names")
+    parser.add_argument("--skip-e2e", action="store_true", help="skip the calculate_agri() runs")
+    parser.add_argument("--latency", type=float, default=0.0, help="simulated upstream latency per request, in ms")
+    parser.add_argument("--fixtures", default=None, help="serve recorded fixtures from this dir (AGRI_FIXTURE_DIR of a record run)")
+    parser.add_argument("--output", default=DEFAULT_OUTPUT)
+    parser.add_argument("--compare", default=None, help="previous results file to check for regressions")
+    parser.add_argument("--tolerance", type=float, default=0.25, help="allowed slowdown before a regression is reported")
+    args = parser.parse_args(argv)
+
+    sizes = [int(s) for s in args.sizes.split(",")] if args.sizes else list(QUICK_SIZES if args.quick else DEFAULT_SIZES)
+    only = set(args.only.split(",")) if args.only else None
+    random.seed(0)
+    sentiment.get_analyzer()   # model load is a one-off, reported by agri_engine --startup-report
+
+    report = {"schema": 1, "created": time.strftime("%Y-%m-%dT%H:%M:%SZ", time.gmtime()),
+              "environment": environment(), "sizes": sizes, "results": []}
+    try:
+        for name, make in SCALED_BENCHMARKS.items():
+            if only and name not in only: continue
+            for size in sizes:
+                entry = result(name, size, timed(make(size), repeats_for(size)))
+                report["results"].append(entry)
+                print(f"{name:<22}{size:>8}  {entry['seconds']:>10.4f}s  {entry['per_item_us']:>10.2f}us/item")
+        if not args.skip_e2e and (not only or "calculate_agri" in only):
+            fixtures = os.path.abspath(args.fixtures) if args.fixtures else None
+            for entry in bench_end_to_end(args.latency / 1000.0, fixtures, repeats=3):
+                report["results"].append(entry)
+                print(f"{entry['name']:<22}{'':>8}  {entry['seconds']:>10.4f}s  {entry['requests']:>6} upstream requests")
+    finally:
+        shutil.rmtree(WORK_DIR, ignore_errors=True)
+
+    with open(args.output + ".tmp", "w") as f: json.dump(report, f, indent=2)
+    os.replace(args.output + ".tmp", args.output)
+    print(f"Wrote {len(report['results'])} results to {args.output}")
+
+    if args.compare:
+        with open(args.compare, "r") as f: baseline = json.load(f)
+        rows = compare(report, baseline, args.tolerance)
+        for name, size, old, new, ratio, regressed in rows:
+            print(f"{'REGRESSION' if regressed else 'ok':<11}{name:<22}{size:>8}  {old:.4f}s -> {new:.4f}s  ({ratio:.2f}x)")
+        if any(row[-1] for row in rows): return 1
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,91 @@
+# AVELLON CHART SERIES
+# Small pre-aggregated series per dashboard timeframe (series/<TF>.json), so
+# the chart downloads only the window it shows instead of all of history.
+#
+# Each series is a grid of time buckets aligned to multiples of its bucket
+# width. A bucket keeps its minimum and maximum points, which preserves peaks
+# and troughs (min/max downsampling) and caps a series at 2 * MAX_BUCKETS
+# points. Because a bucket's state is exactly its stored points, a run only
+# re-buckets the small series file plus the new point - never the history.
+
+import datetime
+import json
+import os
+
+from history_store import to_epoch
+
+SERIES_DIR = "series"
+MAX_BUCKETS = 150            # at most 300 points per series
+MIN_BUCKET_SECONDS = 600
+
+DAY = 24 * 3600
+# Rolling windows in seconds; YTD and MAX are handled in window_start()
+TIMEFRAMES = {"1D": DAY, "1W": 7 * DAY, "1M": 30 * DAY, "YTD": None, "1Y": 365 * DAY, "MAX": None}
+
+def window_start(timeframe, now):
+    if timeframe == "MAX": return None
+    if timeframe == "YTD":
+        year = datetime.datetime.fromtimestamp(now, datetime.timezone.utc).year
+        return datetime.datetime(year, 1, 1, tzinfo=datetime.timezone.utc).timestamp()
+    return now - TIMEFRAMES[timeframe]
+
+def base_bucket_seconds(timeframe):
+    span = TIMEFRAMES[timeframe] or 365 * DAY
+    return max(span // MAX_BUCKETS, MIN_BUCKET_SECONDS)
+
+def downsample(points, width):
+    """Min/max bucketing of [(epoch, timestamp, score)] on a grid of `width` seconds.
+    The newest point is always kept so the line ends at the current value."""
+    buckets = {}
+    for p in points:
+        b = buckets.setdefault(int(p[0] // width), [p, p])
+        if p[2] < b[0][2]: b[0] = p
+        if p[2] > b[1][2]: b[1] = p
+    out = []
+    for key in sorted(buckets):
+        lo, hi = buckets[key]
+        out.extend(sorted({lo, hi}, key=lambda p: p[0]))
+    if points:
+        latest = max(points, key=lambda p: p[0])
+        if out[-1] != latest: out.append(latest)
+    return out
+
+def _load(path):
+    try:
+        with open(path, "r") as f: return json.load(f)
+    except (OSError, ValueError): return None
+
+def _write(path, timeframe, width, points):
+    os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+    payload = {"timeframe": timeframe, "bucket_seconds": width,
+               "points": [{"timestamp": ts, "score": score} for _, ts, score in points]}
+    with open(path + ".tmp", "w") as f: json.dump(payload, f, separators=(",", ":"))
+    os.replace(path + ".tmp", path)
+
+def update_series(timestamp, score, history=None, now=None, series_dir=SERIES_DIR):
+    """Folds one new point into every timeframe's series. A missing series is seeded once from history."""
+    now = now or to_epoch(timestamp)
+    new_point = (to_epoch(timestamp), timestamp, score)
+    written = {}
+    for timeframe in TIMEFRAMES:
+        path = os.path.join(series_dir, f"{timeframe}.json")
+        start = window_start(timeframe, now)
+        existing = _load(path)
+        if existing is not None:
+            width = existing.get("bucket_seconds") or base_bucket_seconds(timeframe)
+            points = [(to_epoch(p["timestamp"]), p["timestamp"], p["score"]) for p in existing["points"]]
+            points.append(new_point)
+        else:
+            width = base_bucket_seconds(timeframe)
+            seed = history.range(start) if history is not None else []
+            points = [(to_epoch(r["timestamp"]), r["timestamp"], r["score"]) for r in seed]
+            if not points or points[-1][1] != timestamp: points.append(new_point)
+        if start is not None:
+            points = [p for p in points if p[0] >= start]
+        else:
+            # MAX has no fixed window: double the bucket width whenever the span outgrows the grid
+            while points and (points[-1][0] - points[0][0]) / width > MAX_BUCKETS: width *= 2
+        points = downsample(points, width)
+        _write(path, timeframe, width, points)
+        written[timeframe] = len(points)
+    return written
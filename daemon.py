@@ -0,0 +1,211 @@
+# AVELLON DAEMON
+# Long-running alternative to the scheduled cold run (python daemon.py).
+# The dedup index, caches, sentiment model and HTTP connections stay warm in
+# memory. Every tick (default 60s) asks the scheduler which sources are due,
+# polls newsdata incrementally through its nextPage cursor so only unseen
+# articles are pulled, and republishes the score and dashboard artifacts in
+# the same tick whenever anything changed. Quotas still apply, so "within a
+# tick" holds for the unmetered feeds (fx, usgs) only. An incremental news
+# poll costs one request, so the daemon polls each query as often as the
+# source's refill rate sustains (newsdata: 8/hour over 5 queries, about every
+# 38 minutes), easing off towards the cold run's minimum interval while a
+# pillar is quiet. Alpha Vantage feeds keep their pillars.json windows.
+#
+# SIGTERM / SIGINT finish the current tick, persist all state and exit; a
+# second signal exits immediately. On start, state is restored from disk.
+
+import argparse
+import datetime
+import json
+import os
+import signal
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import agri_engine as engine
+import alert_store
+import http_client
+import sentiment
+from instrumentation import metrics
+from scheduler import DUE_AT, route
+
+CACHE_DIR = os.environ.get("AGRI_CACHE_DIR", ".agri_cache")
+STATE_PATH = os.path.join(CACHE_DIR, "daemon_state.json")
+TICK_SECONDS = 60
+MAX_PAGES_PER_POLL = 3
+SEEN_PER_QUERY = 500         # article keys remembered per query as its cursor
+IMAGE_WARM_SECONDS = 3600    # Pexels allows 200 requests/hour; the image cache is refreshed hourly
+
+def poll_windows(registry):
+    """Daemon refresh windows for news queries: from the fastest cadence the source's refill rate sustains
+    with one request per query, up to the registry's minimum interval for that query."""
+    windows = {}
+    for source in {q["source"] for q in registry.queries}:
+        queries = [q for q in registry.queries if q["source"] == source]
+        rate = registry.apis.get(source, {}).get("refill_per_hour")
+        if not rate: continue
+        # Tasks are due at DUE_AT of their interval, so the interval is stretched to match
+        fastest = 60.0 * len(queries) / rate / DUE_AT
+        for q in queries: windows[q["id"]] = (fastest, max(fastest, q["refresh_minutes"][0]))
+    return windows
+
+class Daemon:
+    def __init__(self, tick_seconds=TICK_SECONDS, state_path=STATE_PATH):
+        self.tick_seconds = tick_seconds
+        self.state_path = state_path
+        self.stopping = threading.Event()
+        self.windows = {}        # query id -> newest max_articles (pillars.json) articles, newest first
+        self.seen = {}           # query id -> recently seen article keys, newest first
+        self.published = None    # pillar scores of the last publish
+        self.pool = None
+        self.last_image_warm = 0.0
+
+    # --- state ---
+    def load_state(self):
+        try:
+            with open(self.state_path, "r") as f: state = json.load(f)
+        except (OSError, ValueError): state = {}
+        self.windows = state.get("windows", {})
+        self.seen = state.get("seen", {})
+        self.published = state.get("published")
+        return self
+
+    def save_state(self):
+        os.makedirs(os.path.dirname(self.state_path) or ".", exist_ok=True)
+        state = {"windows": self.windows, "seen": self.seen, "published": self.published,
+                 "saved": datetime.datetime.utcnow().isoformat() + "Z"}
+        with open(self.state_path + ".tmp", "w") as f: json.dump(state, f, separators=(",", ":"))
+        os.replace(self.state_path + ".tmp", self.state_path)
+
+    def warm(self):
+        """Loads everything a cold run loads, once."""
+        self.load_state()
+        engine.dedup_index.load()
+        engine.scheduler.load()
+        engine.scheduler.refresh = poll_windows(engine.registry)
+        engine.alert_store.load()
+        sentiment.score_cache.load()
+        sentiment.get_analyzer()
+        engine.image_resolver.load().warm_async()
+        self.last_image_warm = time.time()
+        self.pool = ThreadPoolExecutor(max_workers=engine.FETCH_WORKERS, thread_name_prefix="daemon-fetch")
+
+    # --- one poll ---
+    def _poll(self, req):
+        seen = set().union(*(self.seen.get(m, ()) for m in req["members"]))
+        # A query with no cursor yet takes the first page only, like a cold run
+        pages = MAX_PAGES_PER_POLL if seen else 1
+        return engine.fetch_newsdata_since(engine.registry.query_string(req["terms"]), seen, pages,
+                                           take_page=lambda: engine.scheduler.allow(req["source"]))
+
+    def tick(self):
+        """Polls due sources and republishes if anything changed. Returns True when it published."""
+        tick_started = time.perf_counter()
+        metrics.reset()
+        engine.driver_readings.clear()
+        ctx = engine.new_run_context(max_alerts=alert_store.MAX_ALERTS)
+        if time.time() - self.last_image_warm > IMAGE_WARM_SECONDS:
+            engine.image_resolver.warm_async()
+            self.last_image_warm = time.time()
+        plan = engine.scheduler.plan()
+
+        started = time.monotonic()
+        deadline = lambda source: started + engine.SOURCE_DEADLINES[source]
+        news_futures = [self.pool.submit(self._poll, req) for req in plan["news"]]
+        feed_futures = {f: self.pool.submit(engine.FEED_FUNCTIONS[f][0]) for f in plan["feeds"]}
+
+        new_articles, changed = 0, set()
+        for req, future in zip(plan["news"], news_futures):
+            fresh = engine.await_source(future, deadline(req["source"]), None, engine.registry.query_string(req["terms"]), "fetch_newsdata_since")
+            if fresh is None: continue
+            routed = route(fresh, req["members"])
+            for q in (q for q in engine.registry.queries if q["id"] in req["members"]):
+                articles = list(routed.get(q["id"], ()))
+                new_articles += len(articles)
+                if not articles:
+                    # Polled, nothing new: the score stands and the scheduler sees a quiet task
+                    last = engine.scheduler.last_score(q["id"])
+                    engine.scheduler.record(q["id"], q["baseline"] if last is None else last)
+                    continue
+                changed.add(q["id"])
+                self.seen[q["id"]] = ([engine.article_key(a) for a in articles] + self.seen.get(q["id"], []))[:SEEN_PER_QUERY]
+                window = engine.registry.news_limits(q["source"])[1] or SEEN_PER_QUERY
+                self.windows[q["id"]] = (articles + self.windows.get(q["id"], []))[:window]
+
+        # Windows that changed are re-scored in registry order; old articles count but are not re-alerted
+        query_scores = {}
+        for q in engine.registry.queries:
+            last = engine.scheduler.last_score(q["id"])
+            if q["id"] in changed:
+                score = engine.score_newsdata_articles(ctx, engine.registry.query_string(q["terms"]), self.windows[q["id"]], q["baseline"])
+                engine.scheduler.record(q["id"], score)
+                last = score
+            query_scores[q["id"]] = q["baseline"] if last is None else last
+        feed_scores = engine.gather_feed_scores(feed_futures, deadline)
+        live_inputs = engine.combine_pillars(query_scores, feed_scores)
+        engine.resolve_pending_images(ctx, time.monotonic() + engine.SOURCE_DEADLINES["pexels"])
+        metrics.add_stage("fetch", time.monotonic() - started)
+
+        ctx.commit()
+        fresh_alerts = ctx.alerts.ranked()
+        published = bool(fresh_alerts) or live_inputs != self.published
+        if published:
+            score = engine.publish(live_inputs, engine.alert_store.merge(fresh_alerts))
+            self.published = live_inputs
+            print(f"[{datetime.datetime.utcnow():%H:%M:%S}] Published AGRI {score}: {new_articles} new articles, {len(fresh_alerts)} new alerts")
+        else:
+            engine.scheduler.save()
+        self.save_state()
+        metrics.add_stage("total", time.perf_counter() - tick_started)
+        metrics.write()
+        return published
+
+    # --- lifecycle ---
+    def request_stop(self, signum=None, frame=None):
+        print("Shutdown requested; finishing the current tick.")
+        self.stopping.set()
+        # A second signal terminates immediately
+        signal.signal(signal.SIGINT, signal.SIG_DFL)
+        signal.signal(signal.SIGTERM, signal.SIG_DFL)
+
+    def shutdown(self):
+        if self.pool: self.pool.shutdown(wait=False, cancel_futures=True)
+        self.save_state()
+        engine.scheduler.save()
+        engine.dedup_index.save()
+        engine.alert_store.save()
+        sentiment.score_cache.save()
+        engine.image_resolver.wait(engine.SOURCE_DEADLINES["pexels"])
+        engine.image_resolver.save()
+        http_client.close_all()
+        print("Daemon state saved.")
+
+    def run(self, max_ticks=None):
+        signal.signal(signal.SIGTERM, self.request_stop)
+        signal.signal(signal.SIGINT, self.request_stop)
+        print("Starting Avellon daemon...")
+        self.warm()
+        ticks = 0
+        try:
+            while not self.stopping.is_set():
+                started = time.monotonic()
+                try:
+                    self.tick()
+                except Exception as e:
+                    print(f"Tick failed: {e}")
+                ticks += 1
+                if max_ticks and ticks >= max_ticks: break
+                self.stopping.wait(max(self.tick_seconds - (time.monotonic() - started), 0))
+        finally:
+            self.shutdown()
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Run the AGRI engine as a long-running incremental daemon")
+    parser.add_argument("--interval", type=float, default=TICK_SECONDS, help="seconds between ticks")
+    parser.add_argument("--ticks", type=int, default=None, help="exit after this many ticks")
+    args = parser.parse_args(argv)
+    Daemon(tick_seconds=args.interval).run(max_ticks=args.ticks)
+
+if __name__ == "__main__":
+    main()
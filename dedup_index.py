@@ -0,0 +1,147 @@
+# AVELLON HEADLINE DEDUPLICATION INDEX
+# MinHash signatures over character shingles, bucketed with LSH banding so a
+# near-duplicate lookup only compares against a handful of candidates instead
+# of every headline seen so far. Persisted to disk with time-based eviction.
+
+import json
+import os
+import re
+import time
+import zlib
+from difflib import SequenceMatcher
+
+CACHE_DIR = os.environ.get("AGRI_CACHE_DIR", ".agri_cache")
+INDEX_PATH = os.path.join(CACHE_DIR, "dedup_index.json")
+
+SHINGLE_SIZE = 3
+BANDS, ROWS = 16, 3   # 48 slots; candidate pairs start appearing around 0.4 shingle similarity
+SLOTS = BANDS * ROWS
+# Cheap pre-check before SequenceMatcher: true near-duplicates (ratio > 0.65) agree on well over
+# 20% of signature slots, unrelated headlines almost never do.
+MIN_SIGNATURE_AGREEMENT = 0.2
+
+def normalize_title(title):
+    return " ".join(re.sub(r"[^a-z0-9]+", " ", (title or "").lower()).split())
+
+def shingle_hashes(text):
+    if len(text) <= SHINGLE_SIZE: return {zlib.crc32(text.encode("utf-8"))} if text else set()
+    return {(zlib.crc32(text[i:i + SHINGLE_SIZE].encode("utf-8")) * 0x9E3779B1) & 0xFFFFFFFF
+            for i in range(len(text) - SHINGLE_SIZE + 1)}
+
+def minhash(text):
+    """One-permutation MinHash: each shingle hash lands in one slot and every slot keeps its minimum,
+    so a signature costs one pass over the shingles. Empty slots borrow from the next filled one."""
+    sig = [None] * SLOTS
+    for h in shingle_hashes(text):
+        slot, value = h % SLOTS, h // SLOTS
+        if sig[slot] is None or value < sig[slot]: sig[slot] = value
+    filled = [i for i in range(SLOTS) if sig[i] is not None]
+    if not filled: return []
+    for i in range(SLOTS):
+        if sig[i] is None:
+            j = next((k for k in filled if k > i), filled[0])
+            sig[i] = (sig[j] << 6) | ((j - i) % SLOTS)
+    return sig
+
+def signature_agreement(a, b):
+    return sum(x == y for x, y in zip(a, b)) / SLOTS if a and b else 0.0
+
+def band_keys(signature):
+    return [f"{b}:{'.'.join(map(str, signature[b * ROWS:(b + 1) * ROWS]))}" for b in range(BANDS)] if signature else []
+
+class DedupIndex:
+    """Answers "seen a near-duplicate?" in roughly constant time, across runs.
+
+    Candidates found through LSH buckets are confirmed with the same
+    SequenceMatcher ratio the engine always used, so only the search changed."""
+
+    def __init__(self, path=INDEX_PATH, threshold=0.65, ttl_hours=24, max_entries=50000):
+        self.path = path
+        self.threshold = threshold
+        self.ttl = ttl_hours * 3600
+        self.max_entries = max_entries
+        self.entries = {}   # id -> {"title", "ts", "run", "sig", "bands"}; insertion order == age order
+        self.buckets = {}   # band key -> [id, ...]
+        self._next_id = 0
+
+    # --- persistence ---
+    def load(self):
+        self.entries, self.buckets = {}, {}
+        try:
+            with open(self.path, "r") as f: stored = json.load(f)
+        except (OSError, ValueError): stored = []
+        for item in sorted(stored, key=lambda e: e["ts"]):
+            self._insert(item["title"], item["ts"], item.get("run"))
+        self.evict()
+        return self
+
+    def save(self):
+        self.evict()
+        os.makedirs(os.path.dirname(self.path) or ".", exist_ok=True)
+        tmp = self.path + ".tmp"
+        with open(tmp, "w") as f:
+            json.dump([{"title": e["title"], "ts": e["ts"], "run": e["run"]} for e in self.entries.values()], f, separators=(",", ":"))
+        os.replace(tmp, self.path)
+
+    def evict(self, now=None):
+        """Drops entries older than the TTL, then the oldest ones beyond max_entries."""
+        cutoff = (now or time.time()) - self.ttl
+        stale = [i for i, e in self.entries.items() if e["ts"] < cutoff]
+        overflow = len(self.entries) - len(stale) - self.max_entries
+        if overflow > 0:
+            expired = set(stale)
+            stale += [i for i in self.entries if i not in expired][:overflow]
+        if not stale: return 0
+        for i in stale: del self.entries[i]
+        self._rebuild_buckets()
+        return len(stale)
+
+    def _rebuild_buckets(self):
+        self.buckets = {}
+        for i, e in self.entries.items():
+            for key in e["bands"]: self.buckets.setdefault(key, []).append(i)
+
+    # --- index ops ---
+    def _insert(self, norm, ts, run, sig=None):
+        i = self._next_id
+        self._next_id += 1
+        if sig is None: sig = minhash(norm)
+        bands = band_keys(sig)
+        self.entries[i] = {"title": norm, "ts": ts, "run": run, "sig": sig, "bands": bands}
+        for key in bands: self.buckets.setdefault(key, []).append(i)
+        return self.entries[i]
+
+    def _lookup_norm(self, norm, sig=None):
+        if sig is None: sig = minhash(norm)
+        checked = set()
+        for key in band_keys(sig):
+            for i in self.buckets.get(key, ()):
+                if i in checked or i not in self.entries: continue
+                checked.add(i)
+                entry = self.entries[i]
+                if signature_agreement(sig, entry["sig"]) < MIN_SIGNATURE_AGREEMENT: continue
+                if SequenceMatcher(None, norm, entry["title"]).ratio() > self.threshold:
+                    return entry
+        return None
+
+    def lookup(self, title):
+        """Returns the stored entry for a near-duplicate of title, or None."""
+        return self._lookup_norm(normalize_title(title))
+
+    def record(self, title, now=None, run=None):
+        """Marks title as seen in run. Returns False if it repeats a story from an earlier run.
+        A repeat keeps its first-seen ts, so the TTL runs from first sighting and a recurring story can alert again."""
+        norm = normalize_title(title)
+        now = now or time.time()
+        sig = minhash(norm)
+        entry = self._lookup_norm(norm, sig)
+        if entry is not None:
+            fresh = entry["run"] == run
+            entry["run"] = run
+            return fresh
+        self._insert(norm, now, run, sig)
+        if len(self.entries) > self.max_entries * 1.1: self.evict(now)
+        return True
+
+    def __len__(self):
+        return len(self.entries)
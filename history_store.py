@@ -0,0 +1,130 @@
+# AVELLON HISTORY STORE
+# Append-only JSON Lines log of every run: one record per line holding the
+# composite score and all pillar scores. Appending never rewrites the file,
+# the latest value is read by seeking from the end, and timestamp range
+# queries binary-search byte offsets, so per-run I/O no longer grows with
+# history and nothing has to be truncated.
+
+import datetime
+import json
+import os
+import time
+
+HISTORY_PATH = "history.jsonl"
+LEGACY_PATH = "history.json"
+# history.json is only the dashboard's fallback when a series file is missing; it holds this many days
+EXPORT_DAYS = 30
+
+def to_epoch(ts):
+    """ISO-8601 string (with or without 'Z'), datetime, or epoch number -> epoch seconds."""
+    if isinstance(ts, (int, float)): return float(ts)
+    if isinstance(ts, datetime.datetime):
+        return (ts if ts.tzinfo else ts.replace(tzinfo=datetime.timezone.utc)).timestamp()
+    parsed = datetime.datetime.fromisoformat(ts.replace("Z", "+00:00"))
+    return to_epoch(parsed)
+
+class HistoryStore:
+    def __init__(self, path=HISTORY_PATH):
+        self.path = path
+
+    def exists(self):
+        return os.path.exists(self.path)
+
+    def append(self, timestamp, score, pillars=None, drivers=None):
+        record = {"timestamp": timestamp, "score": score}
+        if pillars: record["pillars"] = pillars
+        # Raw readings behind the clamped pillars, so backtests can re-apply other clamp rules
+        if drivers: record["drivers"] = drivers
+        with open(self.path, "a", encoding="utf-8") as f:
+            f.write(json.dumps(record, separators=(",", ":")) + "\n")
+        return record
+
+    def latest(self):
+        """Last record, read from the tail of the file: O(1) in the length of history."""
+        try:
+            with open(self.path, "rb") as f:
+                f.seek(0, os.SEEK_END)
+                end = f.tell()
+                block, data = 4096, b""
+                while end > 0:
+                    start = max(end - block, 0)
+                    f.seek(start)
+                    data = f.read(end - start) + data
+                    lines = data.rstrip(b"\n").split(b"\n")
+                    if len(lines) > 1 or start == 0:
+                        return json.loads(lines[-1]) if lines[-1].strip() else None
+                    end = start
+        except OSError:
+            pass
+        return None
+
+    def __iter__(self):
+        try:
+            with open(self.path, "r", encoding="utf-8") as f:
+                for line in f:
+                    if line.strip(): yield json.loads(line)
+        except OSError:
+            return
+
+    def _seek_to(self, f, start_epoch, window=4096):
+        """Positions f at the first record at or after start_epoch. Records are appended in time order,
+        so a binary search over byte offsets narrows it to one window, then a short scan finishes."""
+        f.seek(0, os.SEEK_END)
+        lo, hi = 0, f.tell()
+        # Invariant: the target record starts after lo
+        while hi - lo > window:
+            mid = (lo + hi) // 2
+            f.seek(mid)
+            f.readline()
+            line = f.readline()
+            if line and to_epoch(json.loads(line)["timestamp"]) < start_epoch: lo = mid
+            else: hi = mid
+        f.seek(lo)
+        if lo: f.readline()
+        while True:
+            pos = f.tell()
+            line = f.readline()
+            if not line or (line.strip() and to_epoch(json.loads(line)["timestamp"]) >= start_epoch): break
+        f.seek(pos)
+
+    def range(self, start=None, end=None):
+        """Records with start <= timestamp <= end (either bound optional), oldest first."""
+        end_epoch = None if end is None else to_epoch(end)
+        try:
+            f = open(self.path, "rb")
+        except OSError:
+            return
+        with f:
+            if start is not None: self._seek_to(f, to_epoch(start))
+            for line in f:
+                if not line.strip(): continue
+                record = json.loads(line)
+                if end_epoch is not None and to_epoch(record["timestamp"]) > end_epoch: break
+                yield record
+
+    def import_legacy(self, legacy_path=LEGACY_PATH):
+        """One-off migration from the old rewritten history.json (composite score only)."""
+        try:
+            with open(legacy_path, "r") as f: hist = json.load(f)
+        except (OSError, ValueError):
+            return 0
+        hist.sort(key=lambda p: to_epoch(p["timestamp"]))
+        with open(self.path, "a", encoding="utf-8") as f:
+            for point in hist:
+                f.write(json.dumps({"timestamp": point["timestamp"], "score": point["score"]}, separators=(",", ":")) + "\n")
+        return len(hist)
+
+    def export_json(self, path=LEGACY_PATH, days=EXPORT_DAYS, now=None):
+        """Writes the [{"timestamp", "score"}] array of the last `days` days that the dashboard falls back to.
+        Reads only that window (range() binary-searches its start); history.jsonl stays the source of truth."""
+        start = (now or time.time()) - days * 86400
+        with open(path + ".tmp", "w") as f:
+            json.dump([{"timestamp": r["timestamp"], "score": r["score"]} for r in self.range(start)], f, separators=(",", ":"))
+        os.replace(path + ".tmp", path)
+
+if __name__ == "__main__":
+    # On-demand export: python history_store.py [days]
+    import sys
+    days = float(sys.argv[1]) if len(sys.argv) > 1 else EXPORT_DAYS
+    HistoryStore().export_json(days=days)
+    print(f"Exported the last {days:g} days to {LEGACY_PATH}")
@@ -0,0 +1,206 @@
+# AVELLON HTTP CLIENT
+# Shared transport for every upstream call: keep-alive connections pooled per
+# host, separate connect/read timeouts, gzip decoding, bounded retries with
+# backoff, and ETag / Last-Modified revalidation for static feeds so an
+# unchanged feed costs a 304 instead of a full download. Requests pass through
+# the TTL / record / replay layer in response_cache.py first.
+
+import gzip
+import hashlib
+import http.client
+import json
+import os
+import random
+import threading
+import time
+import urllib.parse
+import zlib
+
+import response_cache
+from instrumentation import metrics
+from response_cache import redact
+
+CACHE_DIR = os.environ.get("AGRI_CACHE_DIR", ".agri_cache")
+VALIDATOR_DIR = os.path.join(CACHE_DIR, "http_validators")
+
+CONNECT_TIMEOUT = 5.0
+READ_TIMEOUT = 20.0
+MAX_RETRIES = 2
+BACKOFF_BASE = 0.5
+MAX_IDLE_PER_HOST = 4
+MAX_REDIRECTS = 5
+USER_AGENT = "AvellonBot/2.0"
+
+RETRY_STATUSES = {429, 500, 502, 503, 504}
+# e.g. "http://127.0.0.1:8765": sends every request to that server instead, keeping the original
+# Host header, path and query. benchmarks.py uses it to point the engine at a local stub.
+HOST_OVERRIDE = os.environ.get("AGRI_HTTP_HOST_OVERRIDE")
+
+class HTTPError(Exception):
+    def __init__(self, status, url, body=b""):
+        super().__init__(f"HTTP {status} for {redact(url)}")
+        self.status = status
+        self.body = body
+
+# --- CONNECTION POOL ---
+_pool = {}
+_pool_lock = threading.Lock()
+
+def _checkout(scheme, host, port, connect_timeout):
+    with _pool_lock:
+        idle = _pool.get((scheme, host, port))
+        if idle: return idle.pop(), True
+    cls = http.client.HTTPSConnection if scheme == "https" else http.client.HTTPConnection
+    conn = cls(host, port, timeout=connect_timeout)
+    conn.connect()
+    return conn, False
+
+def _checkin(scheme, host, port, conn):
+    with _pool_lock:
+        idle = _pool.setdefault((scheme, host, port), [])
+        if len(idle) < MAX_IDLE_PER_HOST:
+            idle.append(conn)
+            return
+    conn.close()
+
+def close_all():
+    with _pool_lock:
+        conns = [c for idle in _pool.values() for c in idle]
+        _pool.clear()
+    for c in conns: c.close()
+
+def _decode(body, encoding):
+    encoding = (encoding or "").lower()
+    if encoding == "gzip": return gzip.decompress(body)
+    if encoding == "deflate": return zlib.decompress(body)
+    return body
+
+def _send_once(method, url, headers, body, timeout):
+    """One request on a pooled connection. Returns (status, headers, body, location, wire_bytes)."""
+    parts = urllib.parse.urlsplit(url)
+    scheme = parts.scheme or "https"
+    port = parts.port or (443 if scheme == "https" else 80)
+    path = (parts.path or "/") + (f"?{parts.query}" if parts.query else "")
+    host = parts.hostname
+    if HOST_OVERRIDE:
+        headers = dict(headers, Host=parts.netloc)
+        target = urllib.parse.urlsplit(HOST_OVERRIDE)
+        scheme, host, port = target.scheme, target.hostname, target.port or (443 if target.scheme == "https" else 80)
+    connect_timeout, read_timeout = timeout
+    conn, reused = _checkout(scheme, host, port, connect_timeout)
+    try:
+        conn.sock.settimeout(read_timeout)
+        conn.request(method, path, body=body, headers=headers)
+        resp = conn.getresponse()
+        raw = resp.read()
+    except (http.client.RemoteDisconnected, BrokenPipeError, ConnectionResetError):
+        conn.close()
+        # A pooled connection the server already closed is not a real failure; retry once on a fresh one
+        if not reused: raise
+        return _send_once(method, url, headers, body, timeout)
+    except Exception:
+        conn.close()
+        raise
+    if resp.will_close: conn.close()
+    else: _checkin(scheme, host, port, conn)
+    return resp.status, resp.headers, _decode(raw, resp.headers.get("Content-Encoding")), resp.headers.get("Location"), len(raw)
+
+# --- CONDITIONAL REQUEST STORE ---
+def _validator_path(url):
+    return os.path.join(VALIDATOR_DIR, hashlib.sha1(redact(url).encode("utf-8")).hexdigest() + ".json")
+
+def _load_validator(url):
+    try:
+        with open(_validator_path(url), "r") as f: return json.load(f)
+    except (OSError, ValueError): return None
+
+def _store_validator(url, resp_headers, body):
+    etag, modified = resp_headers.get("ETag"), resp_headers.get("Last-Modified")
+    if not etag and not modified: return
+    os.makedirs(VALIDATOR_DIR, exist_ok=True)
+    path = _validator_path(url)
+    with open(path + ".tmp", "w") as f:
+        json.dump({"etag": etag, "last_modified": modified, "body": body.decode("utf-8")}, f)
+    os.replace(path + ".tmp", path)
+
+# --- PUBLIC API ---
+def request(url, method="GET", headers=None, body=None, timeout=None, retries=MAX_RETRIES, conditional=False, cache_ttl=None):
+    """Performs a request and returns the decoded body as bytes. Raises HTTPError on non-2xx.
+
+    timeout is a (connect, read) pair in seconds, or one number used for both.
+    conditional=True revalidates against the last stored ETag/Last-Modified.
+    cache_ttl overrides the per-source TTL from response_cache.SOURCE_TTLS."""
+    key = response_cache.request_key(method, url, body)
+    source = response_cache.source_for(url)
+    if response_cache.MODE == "replay":
+        data = response_cache.replay(key, url)
+        metrics.record_cache_hit(source)
+        return data
+    ttl = response_cache.SOURCE_TTLS.get(source, 0) if cache_ttl is None else cache_ttl
+    # Record mode always goes to the network so fixtures hold real, current responses
+    if ttl > 0 and response_cache.MODE != "record":
+        cached = response_cache.get(key, ttl)
+        if cached is not None:
+            metrics.record_cache_hit(source)
+            return cached
+
+    data = _fetch(url, method, headers, body, timeout, retries, conditional)
+    if ttl > 0 and response_cache.cacheable(source, data): response_cache.put(key, url, data)
+    if response_cache.MODE == "record": response_cache.record(key, url, data)
+    return data
+
+def _fetch(url, method, headers, body, timeout, retries, conditional):
+    if timeout is None: timeout = (CONNECT_TIMEOUT, READ_TIMEOUT)
+    elif not isinstance(timeout, tuple): timeout = (min(CONNECT_TIMEOUT, timeout), timeout)
+    hdrs = {"User-Agent": USER_AGENT, "Accept-Encoding": "gzip", "Connection": "keep-alive"}
+    hdrs.update(headers or {})
+
+    origin = url
+    cached = _load_validator(origin) if conditional else None
+    if cached:
+        if cached.get("etag"): hdrs["If-None-Match"] = cached["etag"]
+        if cached.get("last_modified"): hdrs["If-Modified-Since"] = cached["last_modified"]
+
+    source, started = response_cache.source_for(origin), time.perf_counter()
+    attempt, redirects, wire_bytes = 0, 0, 0
+    def report(status=None, error=None):
+        metrics.record_request(source, time.perf_counter() - started, wire_bytes, attempt, status, error)
+
+    while True:
+        try:
+            status, resp_headers, data, location, size = _send_once(method, url, hdrs, body, timeout)
+            wire_bytes += size
+        except (OSError, http.client.HTTPException) as e:
+            if attempt >= retries:
+                report(error=e)
+                raise
+            attempt += 1
+            time.sleep(BACKOFF_BASE * (2 ** (attempt - 1)) * (1 + random.random()))
+            continue
+
+        if status == 304 and cached:
+            report(status)
+            return cached["body"].encode("utf-8")
+        if status in (301, 302, 303, 307, 308) and location and redirects < MAX_REDIRECTS:
+            redirects += 1
+            url = urllib.parse.urljoin(url, location)
+            if status == 303: method, body = "GET", None
+            continue
+        if status in RETRY_STATUSES and attempt < retries:
+            attempt += 1
+            retry_after = resp_headers.get("Retry-After")
+            delay = float(retry_after) if retry_after and retry_after.isdigit() else BACKOFF_BASE * (2 ** (attempt - 1)) * (1 + random.random())
+            time.sleep(min(delay, 10.0))
+            continue
+        report(status, None if 200 <= status < 300 else status)
+        if not 200 <= status < 300: raise HTTPError(status, url, data)
+        if conditional: _store_validator(origin, resp_headers, data)
+        return data
+
+def get_json(url, **kwargs):
+    return json.loads(request(url, **kwargs).decode("utf-8"))
+
+def post_json(url, payload, headers=None, **kwargs):
+    hdrs = {"Content-Type": "application/json"}
+    hdrs.update(headers or {})
+    return json.loads(request(url, method="POST", headers=hdrs, body=json.dumps(payload).encode("utf-8"), **kwargs).decode("utf-8"))
@@ -0,0 +1,106 @@
+# AVELLON IMAGE RESOLVER
+# Every fallback image query comes from the fixed IMAGE_PROMPTS vocabulary, so
+# prompt -> Pexels URL results are cached on disk with an expiry and refreshed
+# in bulk on a background thread. Resolving an article's image is then a pure
+# local lookup; no Pexels request ever runs inside the article loop.
+
+import json
+import os
+import random
+import threading
+import time
+
+CACHE_DIR = os.environ.get("AGRI_CACHE_DIR", ".agri_cache")
+IMAGE_CACHE_PATH = os.path.join(CACHE_DIR, "image_cache.json")
+IMAGE_TTL = 14 * 24 * 3600
+# Pexels allows 200 requests/hour; a run refreshes at most this many prompts
+MAX_WARM_PER_RUN = 40
+
+class ImageResolver:
+    """Prompt -> image URL cache, warmed in the background from a search function."""
+
+    def __init__(self, prompts, search, path=IMAGE_CACHE_PATH, ttl=IMAGE_TTL, max_warm=MAX_WARM_PER_RUN):
+        self.prompts = prompts   # {category: [prompt, ...]}
+        self.search = search     # prompt -> URL or None; only called from the warm thread
+        self.path = path
+        self.ttl = ttl
+        self.max_warm = max_warm
+        self.entries = {}        # prompt -> {"url", "ts"}
+        self._lock = threading.Lock()
+        self._save_lock = threading.Lock()   # the warm thread saves too when it finishes
+        self._progress = threading.Condition(self._lock)
+        self._thread = None
+        self._warming = False
+        self.stats = {"hits": 0, "category_hits": 0, "misses": 0, "warmed": 0}
+
+    def load(self):
+        try:
+            with open(self.path, "r") as f: self.entries = json.load(f)
+        except (OSError, ValueError): self.entries = {}
+        return self
+
+    def save(self):
+        with self._save_lock:
+            with self._lock: snapshot = dict(self.entries)
+            os.makedirs(os.path.dirname(self.path) or ".", exist_ok=True)
+            with open(self.path + ".tmp", "w") as f: json.dump(snapshot, f, indent=1, sort_keys=True)
+            os.replace(self.path + ".tmp", self.path)
+
+    def stale_prompts(self, now=None):
+        """Prompts with no cached URL first, then the ones closest to expiry."""
+        now = now or time.time()
+        stale = []
+        for prompt in (p for ps in self.prompts.values() for p in ps):
+            entry = self.entries.get(prompt)
+            if entry is None: stale.append((0, prompt))
+            elif now - entry["ts"] > self.ttl: stale.append((entry["ts"], prompt))
+        return [p for _, p in sorted(stale)]
+
+    def _warm(self, prompts):
+        for prompt in prompts:
+            try: url = self.search(prompt)
+            except Exception: url = None
+            with self._progress:
+                if url:
+                    self.entries[prompt] = {"url": url, "ts": time.time()}
+                    self.stats["warmed"] += 1
+                self._progress.notify_all()
+        with self._progress:
+            self._warming = False
+            self._progress.notify_all()
+        # Searches that finish after the run's own save() would otherwise be lost
+        if self.stats["warmed"]: self.save()
+
+    def warm_async(self):
+        """Starts refreshing missing/expired prompts on a daemon thread; returns immediately."""
+        if self._thread and self._thread.is_alive(): return self._thread
+        batch = self.stale_prompts()[:self.max_warm]
+        self._warming = True
+        self._thread = threading.Thread(target=self._warm, args=(batch,), name="image-warm", daemon=True)
+        self._thread.start()
+        return self._thread
+
+    def wait(self, timeout=None):
+        """Joins the warm thread for up to timeout seconds; True once it has finished (and saved)."""
+        if self._thread: self._thread.join(timeout)
+        return not (self._thread and self._thread.is_alive())
+
+    def wait_for(self, needed, timeout=None):
+        """Blocks until every (prompt, category) in needed resolves locally, the warm-up ends, or timeout."""
+        def ready():
+            return not self._warming or all(p in self.entries or any(q in self.entries for q in self.prompts.get(c, ())) for p, c in needed)
+        with self._progress: return self._progress.wait_for(ready, timeout)
+
+    def lookup(self, prompt, category=None):
+        """Local only: the prompt's cached URL, else any cached URL for its category, else None."""
+        with self._lock:
+            entry = self.entries.get(prompt)
+            if entry:
+                self.stats["hits"] += 1
+                return entry["url"]
+            pool = [self.entries[p]["url"] for p in self.prompts.get(category, ()) if p in self.entries]
+        if pool:
+            self.stats["category_hits"] += 1
+            return random.choice(pool)
+        self.stats["misses"] += 1
+        return None
@@ -0,0 +1,181 @@
+# AVELLON RUN INSTRUMENTATION
+# Wall time per pipeline stage, per-upstream request latency, bytes on the
+# wire and retries, and whether each source produced a live value or fell
+# back to its baseline (and why). Everything lands in one metrics file per
+# run, with fixed-bucket latency histograms so runs can be compared, plus a
+# short summary table in the job log.
+
+import functools
+import json
+import os
+import threading
+import time
+from contextlib import contextmanager
+
+CACHE_DIR = os.environ.get("AGRI_CACHE_DIR", ".agri_cache")
+METRICS_PATH = os.environ.get("AGRI_METRICS_PATH", os.path.join(CACHE_DIR, "run_metrics.json"))
+PROFILE_PATH = os.path.join(CACHE_DIR, "run_profile.pstats")
+
+# Histogram upper bounds in milliseconds; the last bucket is open-ended
+BUCKETS_MS = (1, 2, 5, 10, 20, 50, 100, 200, 500, 1000, 2000, 5000, 10000, 30000, 60000)
+
+class Histogram:
+    def __init__(self):
+        self.counts = [0] * (len(BUCKETS_MS) + 1)
+        self.samples = []
+
+    def add(self, seconds):
+        ms = seconds * 1000
+        self.counts[next((i for i, bound in enumerate(BUCKETS_MS) if ms <= bound), len(BUCKETS_MS))] += 1
+        self.samples.append(seconds)
+
+    def percentile(self, q):
+        ordered = sorted(self.samples)
+        return ordered[min(int(q / 100 * len(ordered)), len(ordered) - 1)] if ordered else None
+
+    def to_dict(self):
+        labels = [f"<={b}ms" for b in BUCKETS_MS] + [f">{BUCKETS_MS[-1]}ms"]
+        return {"count": len(self.samples), "total_s": round(sum(self.samples), 4),
+                "p50_s": _r(self.percentile(50)), "p95_s": _r(self.percentile(95)), "max_s": _r(max(self.samples, default=None)),
+                "buckets": {label: n for label, n in zip(labels, self.counts) if n}}
+
+def _r(value):
+    return None if value is None else round(value, 4)
+
+class RunMetrics:
+    """Thread-safe collector for one engine run."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._local = threading.local()
+        self.reset()
+
+    def reset(self):
+        with self._lock:
+            self.started = time.time()
+            self.stages = {}       # stage -> Histogram
+            self.upstreams = {}    # source -> {"requests", "bytes", "retries", "cache_hits", "errors", "statuses", "latency"}
+            self.sources = {}      # instrumented function -> {"calls", "live", "fallback", "fallback_reasons", "latency"}
+
+    # --- stages ---
+    def add_stage(self, name, seconds):
+        with self._lock: self.stages.setdefault(name, Histogram()).add(seconds)
+
+    @contextmanager
+    def stage(self, name):
+        started = time.perf_counter()
+        try: yield
+        finally: self.add_stage(name, time.perf_counter() - started)
+
+    # --- upstream requests (reported by http_client) ---
+    def _upstream(self, source):
+        return self.upstreams.setdefault(source, {"requests": 0, "bytes": 0, "retries": 0, "cache_hits": 0,
+                                                  "errors": 0, "statuses": {}, "latency": Histogram()})
+
+    def record_request(self, source, seconds, wire_bytes=0, retries=0, status=None, error=None):
+        with self._lock:
+            up = self._upstream(source)
+            up["requests"] += 1
+            up["bytes"] += wire_bytes
+            up["retries"] += retries
+            if status is not None: up["statuses"][str(status)] = up["statuses"].get(str(status), 0) + 1
+            if error is not None: up["errors"] += 1
+            up["latency"].add(seconds)
+
+    def record_cache_hit(self, source):
+        with self._lock: self._upstream(source)["cache_hits"] += 1
+
+    # --- sources: live vs fallback ---
+    def _source(self, name):
+        return self.sources.setdefault(name, {"calls": 0, "live": 0, "fallback": 0, "fallback_reasons": {}, "latency": Histogram()})
+
+    def note_fallback(self, name, reason):
+        """Counts a fallback decided outside the source's own call, e.g. the orchestrator's deadline."""
+        with self._lock:
+            src = self._source(name)
+            src["fallback"] += 1
+            src["fallback_reasons"][reason] = src["fallback_reasons"].get(reason, 0) + 1
+
+    def source(self, name):
+        """Decorator: times every call and counts it live unless fallback() was called inside it."""
+        def wrap(fn):
+            @functools.wraps(fn)
+            def inner(*args, **kwargs):
+                outer, call = getattr(self._local, "call", None), {"name": name, "fallback": None}
+                self._local.call = call
+                started = time.perf_counter()
+                try:
+                    return fn(*args, **kwargs)
+                except Exception as e:
+                    call["fallback"] = f"error: {type(e).__name__}"
+                    raise
+                finally:
+                    elapsed = time.perf_counter() - started
+                    self._local.call = outer
+                    with self._lock:
+                        src = self._source(name)
+                        src["calls"] += 1
+                        src["latency"].add(elapsed)
+                        if call["fallback"] is None: src["live"] += 1
+                        else:
+                            src["fallback"] += 1
+                            src["fallback_reasons"][call["fallback"]] = src["fallback_reasons"].get(call["fallback"], 0) + 1
+            return inner
+        return wrap
+
+    def fallback(self, value, reason):
+        """Returns value, marking the current instrumented call as a fallback: `except: return metrics.fallback(50.0, "error")`."""
+        current = getattr(self._local, "call", None)
+        if current is not None: current["fallback"] = reason
+        return value
+
+    # --- output ---
+    def to_dict(self):
+        with self._lock:
+            return {
+                "started": time.strftime("%Y-%m-%dT%H:%M:%SZ", time.gmtime(self.started)),
+                "wall_seconds": round(time.time() - self.started, 3),
+                "histogram_buckets_ms": list(BUCKETS_MS),
+                "stages": {k: v.to_dict() for k, v in self.stages.items()},
+                "upstreams": {k: dict(v, latency=v["latency"].to_dict()) for k, v in self.upstreams.items()},
+                "sources": {k: dict(v, latency=v["latency"].to_dict()) for k, v in self.sources.items()},
+            }
+
+    def write(self, path=METRICS_PATH):
+        report = self.to_dict()
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        with open(path + ".tmp", "w") as f: json.dump(report, f, indent=1)
+        os.replace(path + ".tmp", path)
+        return report
+
+    def summary(self):
+        """Compact per-source table for the job log."""
+        report = self.to_dict()
+        lines = [f"{'source':<28}{'calls':>6}{'live':>6}{'fallback':>10}{'p95 s':>9}  reasons"]
+        for name, src in sorted(report["sources"].items()):
+            reasons = ", ".join(f"{r} x{n}" for r, n in src["fallback_reasons"].items())
+            lines.append(f"{name:<28}{src['calls']:>6}{src['live']:>6}{src['fallback']:>10}{src['latency']['p95_s'] or 0:>9.3f}  {reasons}")
+        for name, up in sorted(report["upstreams"].items()):
+            lines.append(f"  upstream {name:<17}{up['requests']:>4} req {up['cache_hits']:>4} cached {up['bytes'] / 1024:>9.1f} KiB "
+                         f"{up['retries']:>3} retries {up['errors']:>3} errors  p95 {up['latency']['p95_s'] or 0:.3f}s")
+        return "\n".join(lines)
+
+metrics = RunMetrics()
+
+@contextmanager
+def profiled(enabled, path=PROFILE_PATH, top=25):
+    """cProfile around the block when enabled; saves pstats to path and prints the top cumulative entries."""
+    if not enabled:
+        yield
+        return
+    import cProfile
+    import pstats
+    profiler = cProfile.Profile()
+    profiler.enable()
+    try: yield
+    finally:
+        profiler.disable()
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        profiler.dump_stats(path)
+        print(f"Profile written to {path}")
+        pstats.Stats(profiler).sort_stats("cumulative").print_stats(top)
@@ -0,0 +1,103 @@
+# AVELLON NARRATIVE CACHE
+# The Gemini brief is the slowest and most expensive call in a run. Its inputs
+# are the pillar scores and the top headlines, and most runs barely move
+# either, so the last good narrative is stored with a fingerprint of those
+# inputs (pillar scores rounded to SCORE_STEP plus the normalised headline
+# set). A new narrative is generated only when the inputs changed past the
+# thresholds below or the stored one is too old.
+
+import hashlib
+import json
+import os
+import time
+
+from dedup_index import normalize_title
+
+CACHE_DIR = os.environ.get("AGRI_CACHE_DIR", ".agri_cache")
+NARRATIVE_CACHE_PATH = os.path.join(CACHE_DIR, "narrative_cache.json")
+
+SCORE_STEP = 2.5              # pillar scores are bucketed to this before fingerprinting
+MAX_PILLAR_DELTA = 3.0        # any pillar moving more than this forces a new narrative
+MIN_HEADLINE_OVERLAP = 0.8    # Jaccard overlap of the headline sets needed to reuse
+MAX_AGE = 12 * 3600           # refresh at least twice a day even if nothing moved
+
+def headline_keys(headlines):
+    return sorted({normalize_title(h) for h in headlines if normalize_title(h)})
+
+def fingerprint(pillars, headlines):
+    rounded = {k: round(round(v / SCORE_STEP) * SCORE_STEP, 1) for k, v in sorted(pillars.items())}
+    payload = json.dumps({"pillars": rounded, "headlines": headline_keys(headlines)}, sort_keys=True)
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()[:16]
+
+def headline_overlap(a, b):
+    a, b = set(a), set(b)
+    if not a and not b: return 1.0
+    return len(a & b) / len(a | b)
+
+class NarrativeCache:
+    """Last good narrative plus the inputs it was written for, and lifetime hit statistics."""
+
+    def __init__(self, path=NARRATIVE_CACHE_PATH, max_pillar_delta=MAX_PILLAR_DELTA,
+                 min_headline_overlap=MIN_HEADLINE_OVERLAP, max_age=MAX_AGE):
+        self.path = path
+        self.max_pillar_delta = max_pillar_delta
+        self.min_headline_overlap = min_headline_overlap
+        self.max_age = max_age
+        self.entry = None
+        self.stats = {"hits": 0, "misses": 0, "seconds_saved": 0.0}
+        self.last_decision = None
+
+    def load(self):
+        try:
+            with open(self.path, "r") as f: state = json.load(f)
+        except (OSError, ValueError): state = {}
+        self.entry = state.get("entry")
+        self.stats.update(state.get("stats", {}))
+        return self
+
+    def save(self):
+        os.makedirs(os.path.dirname(self.path) or ".", exist_ok=True)
+        with open(self.path + ".tmp", "w") as f: json.dump({"entry": self.entry, "stats": self.stats}, f, indent=1)
+        os.replace(self.path + ".tmp", self.path)
+
+    def reason_to_refresh(self, pillars, headlines, now=None):
+        """None when the stored narrative still fits these inputs, else a short reason."""
+        entry = self.entry
+        if entry is None: return "empty cache"
+        if (now or time.time()) - entry["ts"] > self.max_age: return "narrative expired"
+        if entry["fingerprint"] == fingerprint(pillars, headlines): return None
+        if set(entry["pillars"]) != set(pillars): return "pillar set changed"
+        delta = max(abs(pillars[k] - entry["pillars"][k]) for k in pillars)
+        if delta > self.max_pillar_delta: return f"pillar moved {delta:.1f} points"
+        overlap = headline_overlap(entry["headlines"], headline_keys(headlines))
+        if overlap < self.min_headline_overlap: return f"headline overlap {overlap:.0%}"
+        return None
+
+    def get_or_generate(self, pillars, headlines, generate, now=None):
+        """Returns the cached narrative if the inputs have not meaningfully changed, else calls generate()."""
+        reason = self.reason_to_refresh(pillars, headlines, now)
+        if reason is None:
+            self.stats["hits"] += 1
+            self.stats["seconds_saved"] = round(self.stats["seconds_saved"] + self.entry["latency"], 2)
+            self.last_decision = {"hit": True, "seconds_saved": self.entry["latency"]}
+            return self.entry["response"]
+        started = time.perf_counter()
+        response = generate()
+        latency = round(time.perf_counter() - started, 2)
+        self.stats["misses"] += 1
+        self.last_decision = {"hit": False, "reason": reason, "latency": latency}
+        # Failure placeholders ("System Offline.", "Analyst system calibrating.") carry no pillar narratives; never cache them
+        if response.get("pillar_narratives"):
+            self.entry = {"fingerprint": fingerprint(pillars, headlines), "pillars": dict(pillars),
+                          "headlines": headline_keys(headlines), "response": response,
+                          "latency": latency, "ts": now or time.time()}
+        return response
+
+    def summary(self):
+        total = self.stats["hits"] + self.stats["misses"]
+        rate = self.stats["hits"] / total if total else 0.0
+        d = self.last_decision or {}
+        if d.get("hit"): run = f"reused cached narrative (saved ~{d['seconds_saved']:.1f}s)"
+        elif d: run = f"regenerated ({d['reason']}, {d['latency']:.1f}s)"
+        else: run = "not used"
+        return f"{run}; hit rate {self.stats['hits']}/{total} ({rate:.0%}), {self.stats['seconds_saved']:.1f}s saved overall"
@@ -0,0 +1,78 @@
+# AVELLON PILLAR REGISTRY
+# Pillars, their weights, the news queries and market/physical feeds behind
+# them, baselines, refresh bounds and per-API quotas are declared in
+# pillars.json rather than in code. Adding a regional or sector query is a
+# config change; the scheduler (scheduler.py) decides when each one runs.
+#
+#   pillars  {name: {"weight", "feed"?}}     feed-backed pillars take max(feed, news)
+#   feeds    {id: {"source", "fallback", "refresh_minutes": [min, max]}}
+#   queries  [{"id", "pillar", "terms", "baseline", "refresh_minutes"}]   scored in this order
+#   apis     {source: {"capacity", "refill_per_hour", "max_query_chars"?,   token-bucket quotas; news sources
+#                      "max_pages"?, "max_articles"?}}                       also cap pages per request and
+#                                                                            articles scored per query (null: all)
+
+import json
+import os
+
+REGISTRY_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), "pillars.json")
+DEFAULT_REFRESH_MINUTES = (0, 0)
+DEFAULT_MAX_PAGES = 1
+DEFAULT_MAX_ARTICLES = 10
+
+class Registry:
+    def __init__(self, config):
+        self.apis = config.get("apis", {})
+        self.pillars = config["pillars"]
+        self.feeds = config.get("feeds", {})
+        self.queries = config.get("queries", [])
+        for q in self.queries:
+            q.setdefault("source", "newsdata")
+            q["refresh_minutes"] = tuple(q.get("refresh_minutes", DEFAULT_REFRESH_MINUTES))
+        for feed in self.feeds.values():
+            feed["refresh_minutes"] = tuple(feed.get("refresh_minutes", DEFAULT_REFRESH_MINUTES))
+        self.validate()
+
+    def validate(self):
+        total = sum(p["weight"] for p in self.pillars.values())
+        if abs(total - 1.0) > 1e-6:
+            raise ValueError(f"Pillar weights sum to {total:.4f}, expected 1.0")
+        ids = [q["id"] for q in self.queries]
+        if len(ids) != len(set(ids)):
+            raise ValueError("Query ids must be unique")
+        for q in self.queries:
+            if q["pillar"] not in self.pillars:
+                raise ValueError(f"Query {q['id']!r} refers to unknown pillar {q['pillar']!r}")
+            if not q.get("terms"):
+                raise ValueError(f"Query {q['id']!r} has no terms")
+        for name, pillar in self.pillars.items():
+            if pillar.get("feed") and pillar["feed"] not in self.feeds:
+                raise ValueError(f"Pillar {name!r} refers to unknown feed {pillar['feed']!r}")
+            if not pillar.get("feed") and not self.queries_for(name):
+                raise ValueError(f"Pillar {name!r} has neither a feed nor any queries")
+        for source in {q["source"] for q in self.queries}:
+            max_pages, max_articles = self.news_limits(source)
+            if not (isinstance(max_pages, int) and max_pages >= 1):
+                raise ValueError(f"{source}: max_pages must be a positive integer, got {max_pages!r}")
+            if max_articles is not None and not (isinstance(max_articles, int) and max_articles >= 1):
+                raise ValueError(f"{source}: max_articles must be a positive integer or null, got {max_articles!r}")
+        for task in list(self.queries) + list(self.feeds.values()):
+            lo, hi = task["refresh_minutes"]
+            if not 0 <= lo <= hi:
+                raise ValueError(f"refresh_minutes must be [min, max] with 0 <= min <= max, got {[lo, hi]}")
+
+    def weights(self):
+        return {name: p["weight"] for name, p in self.pillars.items()}
+
+    def queries_for(self, pillar):
+        return [q for q in self.queries if q["pillar"] == pillar]
+
+    def news_limits(self, source):
+        """(pages fetched per request, articles scored per query or None for all) for a news source."""
+        api = self.apis.get(source, {})
+        return api.get("max_pages", DEFAULT_MAX_PAGES), api.get("max_articles", DEFAULT_MAX_ARTICLES)
+
+    def query_string(self, terms):
+        return " OR ".join(terms)
+
+def load_registry(path=REGISTRY_PATH):
+    with open(path, "r") as f: return Registry(json.load(f))
@@ -0,0 +1,126 @@
+# AVELLON RESPONSE CACHE
+# On-disk cache of upstream responses keyed by request, with a TTL per source
+# and size-bounded eviction, so slow-moving series (FX rates, daily Alpha
+# Vantage data, the USGS feed) stop burning API quota every run.
+#
+# AGRI_HTTP_MODE switches the transport:
+#   live   - normal operation, TTL cache in front of the network (default)
+#   record - every real response is also saved as a fixture under AGRI_FIXTURE_DIR
+#   replay - responses are served only from fixtures; nothing touches the network
+
+import hashlib
+import json
+import os
+import threading
+import time
+import urllib.parse
+
+CACHE_DIR = os.environ.get("AGRI_CACHE_DIR", ".agri_cache")
+RESPONSE_DIR = os.path.join(CACHE_DIR, "responses")
+FIXTURE_DIR = os.environ.get("AGRI_FIXTURE_DIR", "fixtures")
+MODE = os.environ.get("AGRI_HTTP_MODE", "live").lower()
+MAX_CACHE_BYTES = 50 * 1024 * 1024
+
+SOURCE_HOSTS = {
+    "newsdata.io": "newsdata", "www.alphavantage.co": "alphavantage",
+    "api.frankfurter.app": "frankfurter", "earthquake.usgs.gov": "usgs",
+    "api.pexels.com": "pexels", "generativelanguage.googleapis.com": "gemini",
+}
+# Seconds a cached response stays fresh. 0 disables caching for that source.
+SOURCE_TTLS = {
+    "newsdata": 30 * 60,            # breaking news; only saves quota on re-runs
+    "alphavantage": 12 * 3600,      # daily BRENT / TREASURY_YIELD series
+    "frankfurter": 6 * 3600,        # ECB reference rates update once a day
+    "usgs": 10 * 60,                # also revalidated with ETag once stale
+    "pexels": 7 * 24 * 3600,
+    "gemini": 0,
+}
+
+# A 2xx body is cached only if it carries real data. Alpha Vantage, for one, answers rate limits
+# and errors with HTTP 200 ({"Note": ...} / {"Information": ...}); caching those would pin its
+# feeds to their fallbacks for the whole TTL. Sources without a check cache any 2xx body.
+PAYLOAD_CHECKS = {
+    "newsdata": lambda p: p.get("status") == "success",
+    "alphavantage": lambda p: bool(p.get("data")),
+    "frankfurter": lambda p: bool(p.get("rates")),
+    "usgs": lambda p: "features" in p,
+    "pexels": lambda p: "photos" in p,
+}
+
+class ReplayMiss(Exception):
+    pass
+
+_lock = threading.Lock()
+
+def redact(url):
+    """Drops credentials from the query string before a URL is logged or used as a key."""
+    parts = urllib.parse.urlsplit(url)
+    query = [(k, "***" if k.lower() in ("apikey", "key", "api_key") else v) for k, v in urllib.parse.parse_qsl(parts.query, keep_blank_values=True)]
+    return urllib.parse.urlunsplit(parts._replace(query=urllib.parse.urlencode(query, safe="*")))
+
+def source_for(url):
+    return SOURCE_HOSTS.get(urllib.parse.urlsplit(url).hostname or "", "other")
+
+def request_key(method, url, body=None):
+    """Stable key for a request. Credentials are stripped so keys and fixtures never hold API keys."""
+    digest = hashlib.sha256(f"{method} {redact(url)}".encode("utf-8"))
+    if body: digest.update(body)
+    return f"{source_for(url)}-{digest.hexdigest()[:32]}"
+
+def _read(path):
+    try:
+        with open(path, "r") as f: return json.load(f)
+    except (OSError, ValueError): return None
+
+def _write(directory, key, url, data):
+    os.makedirs(directory, exist_ok=True)
+    path = os.path.join(directory, key + ".json")
+    with open(path + ".tmp", "w") as f:
+        json.dump({"url": redact(url), "stored": time.time(), "body": data.decode("utf-8")}, f)
+    os.replace(path + ".tmp", path)
+
+def get(key, ttl):
+    entry = _read(os.path.join(RESPONSE_DIR, key + ".json"))
+    if entry is None or time.time() - entry["stored"] > ttl: return None
+    return entry["body"].encode("utf-8")
+
+def cacheable(source, data):
+    check = PAYLOAD_CHECKS.get(source)
+    if check is None: return True
+    try: payload = json.loads(data.decode("utf-8"))
+    except ValueError: return False
+    return isinstance(payload, dict) and check(payload)
+
+def put(key, url, data):
+    with _lock:
+        _write(RESPONSE_DIR, key, url, data)
+        evict()
+
+def evict(max_bytes=MAX_CACHE_BYTES):
+    """Deletes the least recently written responses until the cache fits in max_bytes."""
+    try: names = os.listdir(RESPONSE_DIR)
+    except OSError: return 0
+    files = []
+    for name in names:
+        path = os.path.join(RESPONSE_DIR, name)
+        try: st = os.stat(path)
+        except OSError: continue
+        files.append((st.st_mtime, st.st_size, path))
+    total = sum(size for _, size, _ in files)
+    removed = 0
+    for _, size, path in sorted(files):
+        if total <= max_bytes: break
+        try: os.remove(path)
+        except OSError: continue
+        total -= size
+        removed += 1
+    return removed
+
+def record(key, url, data):
+    with _lock: _write(FIXTURE_DIR, key, url, data)
+
+def replay(key, url):
+    entry = _read(os.path.join(FIXTURE_DIR, key + ".json"))
+    if entry is None:
+        raise ReplayMiss(f"No fixture for {redact(url)}")
+    return entry["body"].encode("utf-8")
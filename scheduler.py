@@ -0,0 +1,211 @@
+# AVELLON QUOTA-AWARE SCHEDULER
+# Decides which registry queries and feeds are fetched on a run:
+#   - every task has a refresh window [min, max] minutes; the interval slides
+#     towards min as the task's volatility (EWMA of absolute score changes)
+#     rises, so quiet pillars are polled less often than moving ones; a
+#     process can override windows per task (Scheduler.refresh; see daemon.py)
+#   - each quota-limited API has a token bucket persisted across runs; due
+#     tasks are served most-overdue first until the bucket is empty
+#   - due news queries that share a term are merged into one request, and
+#     queries that are not yet due ride along for free when they overlap
+# Tasks that are skipped keep their last score.
+
+import itertools
+import json
+import os
+import re
+import threading
+import time
+
+CACHE_DIR = os.environ.get("AGRI_CACHE_DIR", ".agri_cache")
+SCHEDULE_PATH = os.path.join(CACHE_DIR, "scheduler_state.json")
+
+VOLATILITY_ALPHA = 0.3
+# A task whose score typically moves this many points per fetch is refreshed at its minimum interval
+VOLATILE_POINTS = 5.0
+DEFAULT_MAX_QUERY_CHARS = 512
+# A task is due at this fraction of its interval, so a cron run that starts a little early
+# (or a fetch stamped after the previous run's start) does not push it to the next period
+DUE_AT = 0.9
+
+class TokenBucket:
+    def __init__(self, capacity, refill_per_hour, tokens=None, updated=None):
+        self.capacity = float(capacity)
+        self.rate = refill_per_hour / 3600.0
+        self.tokens = self.capacity if tokens is None else min(float(tokens), self.capacity)
+        self.updated = updated
+
+    def refill(self, now):
+        if self.updated is not None and now > self.updated:
+            self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+
+    def take(self, now, n=1):
+        self.refill(now)
+        if self.tokens < n: return False
+        self.tokens -= n
+        return True
+
+    def to_dict(self):
+        return {"tokens": round(self.tokens, 3), "updated": self.updated}
+
+def term_pattern(terms):
+    return re.compile(r"\b(?:" + "|".join(re.escape(t.lower()) for t in terms) + r")\b")
+
+def route(articles, members):
+    """Splits a merged request's article stream across its member queries ({id: terms}) as lazy iterators,
+    keeping arrival order. An article goes to every member whose terms it mentions; one that mentions none
+    goes to all of them. Members share one pass over the stream; only what one member has read ahead of
+    another is buffered."""
+    if len(members) == 1:
+        return {qid: iter(articles) for qid in members}
+    patterns = {qid: term_pattern(terms) for qid, terms in members.items()}
+    def hits(article):
+        text = f"{article.get('title') or ''} {article.get('description') or ''}".lower()
+        return [qid for qid, pattern in patterns.items() if pattern.search(text)] or list(members)
+    streams = itertools.tee(((article, hits(article)) for article in articles), len(members))
+    return {qid: _member_stream(stream, qid) for qid, stream in zip(members, streams)}
+
+def _member_stream(stream, qid):
+    for article, hits in stream:
+        if qid in hits: yield article
+
+class Scheduler:
+    def __init__(self, registry, path=SCHEDULE_PATH, force=False, available=None):
+        self.registry = registry
+        self.path = path
+        self.force = force          # record/replay: fetch everything, ignore quotas
+        self.available = available  # source -> False when it cannot be called (e.g. no API key); costs no quota
+        self.tasks = {}             # task id -> {"last_run", "last_score", "last_reading", "volatility"}
+        self.refresh = {}           # task id -> [min, max] minutes overriding the registry's window
+        self.buckets = {}
+        self._lock = threading.Lock()   # allow() is called from fetch threads for follow-up pages
+        self.last_plan = None
+        self.planned_at = None      # fetches are stamped with the time they were planned, not finished
+
+    def load(self):
+        try:
+            with open(self.path, "r") as f: state = json.load(f)
+        except (OSError, ValueError): state = {}
+        self.tasks = state.get("tasks", {})
+        self.buckets = {api: TokenBucket(cfg["capacity"], cfg["refill_per_hour"], **state.get("buckets", {}).get(api, {}))
+                        for api, cfg in self.registry.apis.items()}
+        return self
+
+    def save(self):
+        os.makedirs(os.path.dirname(self.path) or ".", exist_ok=True)
+        state = {"tasks": self.tasks, "buckets": {api: b.to_dict() for api, b in self.buckets.items()}}
+        with open(self.path + ".tmp", "w") as f: json.dump(state, f, indent=1, sort_keys=True)
+        os.replace(self.path + ".tmp", self.path)
+
+    # --- timing ---
+    def interval(self, task_id, refresh_minutes):
+        lo, hi = self.refresh.get(task_id, refresh_minutes)
+        volatility = self.tasks.get(task_id, {}).get("volatility", VOLATILE_POINTS)
+        return 60 * (hi - (hi - lo) * min(volatility / VOLATILE_POINTS, 1.0))
+
+    def overdue(self, task_id, refresh_minutes, now):
+        """Elapsed time over refresh interval; >= DUE_AT means due. Never-fetched tasks are always due."""
+        last = self.tasks.get(task_id, {}).get("last_run")
+        if last is None: return float("inf")
+        interval = self.interval(task_id, refresh_minutes)
+        return float("inf") if interval <= 0 else (now - last) / interval
+
+    def record(self, task_id, score, now=None, reading=None):
+        """Stores a fresh score (and the raw reading behind it, if any) for a task and updates its volatility.
+        The run is stamped with the plan's time."""
+        task = self.tasks.setdefault(task_id, {})
+        if reading is not None: task["last_reading"] = reading
+        if task.get("last_score") is not None:
+            change = abs(score - task["last_score"])
+            task["volatility"] = round((1 - VOLATILITY_ALPHA) * task.get("volatility", change) + VOLATILITY_ALPHA * change, 3)
+        task["last_score"] = score
+        task["last_run"] = now or self.planned_at or time.time()
+
+    def last_score(self, task_id):
+        return self.tasks.get(task_id, {}).get("last_score")
+
+    def last_reading(self, task_id):
+        return self.tasks.get(task_id, {}).get("last_reading")
+
+    # --- planning ---
+    def _merge(self, due, idle, max_chars):
+        """Groups due queries that share a term into one request; idle overlapping queries ride along."""
+        requests = []
+        for q in due + idle:
+            terms = {t.lower() for t in q["terms"]}
+            for req in requests:
+                if not terms & req["_terms"]: continue
+                merged = req["terms"] + [t for t in q["terms"] if t.lower() not in req["_terms"]]
+                if len(self.registry.query_string(merged)) > max_chars: continue
+                req["terms"], req["_terms"] = merged, req["_terms"] | terms
+                req["members"][q["id"]] = q["terms"]
+                break
+            else:
+                if q in due:
+                    requests.append({"source": q["source"], "terms": list(q["terms"]), "_terms": terms,
+                                     "members": {q["id"]: q["terms"]}, "priority": 0.0})
+        for req in requests: del req["_terms"]
+        return requests
+
+    def allow(self, source, now=None):
+        """Takes one request's worth of quota from source's bucket; sources without a bucket are unmetered."""
+        bucket = self.buckets.get(source)
+        if self.force or bucket is None: return True
+        with self._lock: return bucket.take(now or time.time())
+
+    def plan(self, now=None):
+        """{"news": [request], "feeds": [feed id], "skipped": {task id: reason}} for this run.
+
+        A request is {"source", "terms", "members": {query id: terms}}; requests are returned in
+        registry order of their first member so scoring order matches a run without the scheduler."""
+        now = now or time.time()
+        self.planned_at = now
+        skipped = {}
+        order = {q["id"]: i for i, q in enumerate(self.registry.queries)}
+        weights = self.registry.weights()
+
+        news = []
+        for source in sorted({q["source"] for q in self.registry.queries}):
+            queries = [q for q in self.registry.queries if q["source"] == source]
+            if self.available and not self.available(source):
+                for q in queries: skipped[q["id"]] = "unavailable"
+                continue
+            due, idle = [], []
+            for q in queries:
+                (due if self.force or self.overdue(q["id"], q["refresh_minutes"], now) >= DUE_AT else idle).append(q)
+            for q in idle: skipped[q["id"]] = "not due"
+            max_chars = self.registry.apis.get(source, {}).get("max_query_chars", DEFAULT_MAX_QUERY_CHARS)
+            requests = self._merge(due, idle, max_chars)
+            # Spend the quota on the most overdue, most heavily weighted requests first
+            for req in requests:
+                req["priority"] = max(min(self.overdue(m, self.registry.queries[order[m]]["refresh_minutes"], now), 1e6)
+                                      * weights[self.registry.queries[order[m]]["pillar"]] for m in req["members"])
+            for req in sorted(requests, key=lambda r: -r["priority"]):
+                if self.allow(source, now):
+                    for m in req["members"]: skipped.pop(m, None)
+                    news.append(req)
+                else:
+                    for m in req["members"]: skipped[m] = "quota"
+        news.sort(key=lambda r: min(order[m] for m in r["members"]))
+        for req in news: del req["priority"]
+
+        feeds = []
+        for feed_id, feed in self.registry.feeds.items():
+            if self.available and not self.available(feed["source"]):
+                skipped[feed_id] = "unavailable"
+            elif not self.force and self.overdue(feed_id, feed["refresh_minutes"], now) < DUE_AT:
+                skipped[feed_id] = "not due"
+            elif self.allow(feed["source"], now): feeds.append(feed_id)
+            else: skipped[feed_id] = "quota"
+
+        self.last_plan = {"news": news, "feeds": feeds, "skipped": skipped}
+        return self.last_plan
+
+    def summary(self):
+        plan = self.last_plan or {"news": [], "feeds": [], "skipped": {}}
+        merged = sum(len(r["members"]) for r in plan["news"])
+        buckets = ", ".join(f"{api} {b.tokens:.1f}/{b.capacity:.0f} tokens" for api, b in self.buckets.items())
+        skipped = ", ".join(f"{k} ({v})" for k, v in plan["skipped"].items()) or "none"
+        return (f"{merged} queries in {len(plan['news'])} requests, {len(plan['feeds'])} feeds; "
+                f"skipped: {skipped}; {buckets}")
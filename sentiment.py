@@ -0,0 +1,139 @@
+# AVELLON SENTIMENT MODEL
+# VADER is built lazily on first use. Its lexicon ships with the repo as a
+# pre-parsed JSON snapshot (vader_lexicon.json), so a cold start never calls
+# nltk.download() or nltk.data.find() and importing the engine stays cheap.
+# Scores are memoised by content hash: syndicated copies of an article, and
+# the same article seen again next run, are never scored twice.
+
+import hashlib
+import json
+import os
+import threading
+import time
+from collections import OrderedDict
+
+LEXICON_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), "vader_lexicon.json")
+CACHE_DIR = os.environ.get("AGRI_CACHE_DIR", ".agri_cache")
+SCORE_CACHE_PATH = os.path.join(CACHE_DIR, "sentiment_cache.json")
+
+_analyzer = None
+_lock = threading.Lock()
+load_info = {"seconds": None, "lexicon": None}
+
+def _from_snapshot(path):
+    from nltk.sentiment.vader import SentimentIntensityAnalyzer, VaderConstants
+    with open(path, "r", encoding="utf-8") as f: lexicon = json.load(f)
+    # Same state SentimentIntensityAnalyzer.__init__ builds, minus the nltk.data lookup and text parse
+    analyzer = SentimentIntensityAnalyzer.__new__(SentimentIntensityAnalyzer)
+    analyzer.lexicon_file = None
+    analyzer.lexicon = lexicon
+    analyzer.constants = VaderConstants()
+    return analyzer
+
+def _from_nltk_data():
+    import nltk
+    from nltk.sentiment import SentimentIntensityAnalyzer
+    try:
+        nltk.data.find('sentiment/vader_lexicon.zip')
+    except LookupError:
+        nltk.download('vader_lexicon', quiet=True)
+    return SentimentIntensityAnalyzer()
+
+def get_analyzer():
+    """Returns the shared VADER analyzer, building it on first call."""
+    global _analyzer
+    if _analyzer is None:
+        with _lock:
+            if _analyzer is None:
+                started = time.perf_counter()
+                if os.path.exists(LEXICON_PATH):
+                    _analyzer, load_info["lexicon"] = _from_snapshot(LEXICON_PATH), "snapshot"
+                else:
+                    _analyzer, load_info["lexicon"] = _from_nltk_data(), "nltk_data"
+                load_info["seconds"] = round(time.perf_counter() - started, 4)
+    return _analyzer
+
+def polarity(text):
+    return get_analyzer().polarity_scores(text)['compound']
+
+def content_key(text):
+    return hashlib.sha1(text.encode("utf-8")).hexdigest()[:20]
+
+class ScoreCache:
+    """Bounded LRU of compound scores keyed by content hash, with an optional on-disk tier."""
+
+    def __init__(self, max_entries=5000, path=None, max_disk_entries=50000):
+        self.max_entries = max_entries
+        self.path = path
+        self.max_disk_entries = max_disk_entries
+        self.memory = OrderedDict()
+        self.disk = {}
+        self.stats = {"hits": 0, "disk_hits": 0, "misses": 0}
+
+    def load(self):
+        if self.path:
+            try:
+                with open(self.path, "r") as f: self.disk = json.load(f)
+            except (OSError, ValueError): self.disk = {}
+        return self
+
+    def save(self):
+        if not self.path: return
+        merged = dict(self.disk)
+        merged.update(self.memory)
+        # Dict order is insertion order, so the oldest scores fall off first
+        if len(merged) > self.max_disk_entries: merged = dict(list(merged.items())[-self.max_disk_entries:])
+        os.makedirs(os.path.dirname(self.path) or ".", exist_ok=True)
+        with open(self.path + ".tmp", "w") as f: json.dump(merged, f, separators=(",", ":"))
+        os.replace(self.path + ".tmp", self.path)
+        self.disk = merged
+
+    def get(self, key):
+        if key in self.memory:
+            self.memory.move_to_end(key)
+            self.stats["hits"] += 1
+            return self.memory[key]
+        if key in self.disk:
+            self.stats["disk_hits"] += 1
+            self.put(key, self.disk[key])
+            return self.disk[key]
+        self.stats["misses"] += 1
+        return None
+
+    def put(self, key, score):
+        self.memory[key] = score
+        self.memory.move_to_end(key)
+        while len(self.memory) > self.max_entries: self.memory.popitem(last=False)
+
+    def summary(self):
+        total = sum(self.stats.values())
+        cached = self.stats["hits"] + self.stats["disk_hits"]
+        return f"{cached}/{total} cached ({self.stats['hits']} memory, {self.stats['disk_hits']} disk), {self.stats['misses']} scored"
+
+score_cache = ScoreCache(path=SCORE_CACHE_PATH)
+
+def score_batch(texts, cache=None):
+    """Compound scores for a batch of texts, in input order. Repeats within the batch
+    and anything already cached are looked up, not re-scored."""
+    cache = score_cache if cache is None else cache
+    keys = [content_key(t) for t in texts]
+    scores = {}
+    for key, text in zip(keys, texts):
+        if key in scores:
+            cache.stats["hits"] += 1
+            continue
+        score = cache.get(key)
+        if score is None:
+            score = polarity(text)
+            cache.put(key, score)
+        scores[key] = score
+    return [scores[k] for k in keys]
+
+def write_snapshot(path=LEXICON_PATH):
+    """Regenerates the vendored lexicon from the installed NLTK data."""
+    lexicon = _from_nltk_data().lexicon
+    with open(path, "w", encoding="utf-8") as f: json.dump(lexicon, f, indent=0, sort_keys=True, ensure_ascii=False)
+    return len(lexicon)
+
+if __name__ == "__main__":
+    print(f"Wrote {write_snapshot()} lexicon entries to {LEXICON_PATH}")
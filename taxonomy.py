@@ -0,0 +1,157 @@
+# AVELLON RISK TAXONOMY
+# Every severity and image-category keyword is compiled once into a table of
+# surface forms. Classifying an article is one C-level tokenising pass plus a
+# set intersection, so a single scan yields both its risk level and the visual
+# category used to pick a Pexels prompt, with whole-word matching throughout.
+import re
+import string
+
+# Ordered by precedence: the first category with a hit wins, as in the original if-chain.
+IMAGE_CATEGORIES = [
+    ("GEOPOLITICS", ["war", "conflict", "military", "army", "weapon", "border", "defense", "missile", "troops", "strike"]),
+    ("MARITIME", ["ship", "port", "sea", "maritime", "canal", "vessel", "freight", "shipping", "pirate", "navy"]),
+    ("ENERGY", ["oil", "gas", "energy", "pipeline", "fuel", "lng", "barrel", "opec", "drilling"]),
+    ("CYBER", ["cyber", "hack", "data", "ransomware", "digital", "network", "server", "bot"]),
+    ("CLIMATE", ["climate", "flood", "drought", "storm", "weather", "carbon", "heat", "disaster"]),
+    ("SANCTIONS", ["sanction", "embargo", "seize", "freeze", "law", "court", "ban", "blacklist"]),
+    ("TECH", ["chip", "tech", "semiconductor", "ai", "5g", "robot", "satellite", "space"]),
+    ("ECONOMY", ["economy", "trade", "tariff", "bank", "market", "stock", "finance", "inflation", "currency", "debt"]),
+]
+DEFAULT_CATEGORY = "INFOGRAPHIC"
+
+HIGH_KEYWORDS = ["war", "conflict", "sanction", "embargo", "blockade", "military", "crisis", "disaster", "collapse", "attack", "breach", "shortage", "nuclear"]
+MEDIUM_KEYWORDS = ["tension", "tariff", "dispute", "warning", "risk", "volatile", "talks", "regulatory", "uncertainty", "debate", "meeting", "proposal", "monitor", "review", "election"]
+
+# "cyber" and "hack" are prefixes by nature (cyberattack, hackers); everything else must be a whole word.
+PREFIX_KEYWORDS = ("cyber", "hack")
+# Inflections that still count as a hit, listed per keyword. Blanket suffixes turned short keywords
+# into unrelated words ("ward", "aid", "band", "courted", "stormed"), so only senses that carry the
+# keyword's meaning are listed; a keyword missing here matches its exact form only.
+INFLECTIONS = {
+    "war": ["wars", "warring"], "conflict": ["conflicts"], "army": ["armies"], "weapon": ["weapons"],
+    "border": ["borders"], "defense": ["defenses"], "missile": ["missiles"], "troops": ["troop"], "strike": ["strikes"],
+    "ship": ["ships", "shipped"], "port": ["ports"], "sea": ["seas"], "canal": ["canals"], "vessel": ["vessels"],
+    "pirate": ["pirates"], "navy": ["navies"],
+    "pipeline": ["pipelines"], "fuel": ["fuels"], "barrel": ["barrels"],
+    "network": ["networks"], "server": ["servers"], "bot": ["bots", "botnet", "botnets"],
+    "flood": ["floods", "flooded", "flooding"], "drought": ["droughts"], "storm": ["storms"], "disaster": ["disasters"],
+    "sanction": ["sanctions", "sanctioned"], "embargo": ["embargoes", "embargoed"],
+    "seize": ["seizes", "seized", "seizing", "seizure", "seizures"], "freeze": ["freezes", "frozen"],
+    "law": ["laws"], "court": ["courts"], "ban": ["bans", "banned", "banning"],
+    "blacklist": ["blacklists", "blacklisted"],
+    "chip": ["chips"], "semiconductor": ["semiconductors"], "robot": ["robots"], "satellite": ["satellites"],
+    "economy": ["economies"], "trade": ["trades", "traded", "trading"], "tariff": ["tariffs"],
+    "bank": ["banks", "banking"], "market": ["markets"], "stock": ["stocks"], "currency": ["currencies"], "debt": ["debts"],
+    "blockade": ["blockades", "blockaded"], "crisis": ["crises"],
+    "collapse": ["collapses", "collapsed", "collapsing"], "attack": ["attacks", "attacked", "attacking", "attackers"],
+    "breach": ["breaches", "breached"], "shortage": ["shortages"],
+    "tension": ["tensions"], "dispute": ["disputes", "disputed"], "warning": ["warnings"], "risk": ["risks"],
+    "debate": ["debates"], "meeting": ["meetings"], "proposal": ["proposals"],
+    "monitor": ["monitors", "monitored", "monitoring"], "review": ["reviews", "reviewed"], "election": ["elections"],
+}
+
+_SEVERITY_RANK = {"HIGH": 2, "MEDIUM": 1}
+# Punctuation becomes whitespace so str.split() tokenises at C speed
+_SEPARATORS = str.maketrans({c: " " for c in string.punctuation + "\u2018\u2019\u201c\u201d\u2013\u2014"})
+_PREFIX = re.compile(r"\b(%s)" % "|".join(PREFIX_KEYWORDS))
+
+def _build():
+    """Maps every surface form of every keyword to (severity rank, category rank)."""
+    table = {}
+    for rank, (_, words) in enumerate(IMAGE_CATEGORIES):
+        for w in words:
+            entry = table.setdefault(w, [0, None])
+            if entry[1] is None: entry[1] = rank
+    for level, words in (("MEDIUM", MEDIUM_KEYWORDS), ("HIGH", HIGH_KEYWORDS)):
+        for w in words: table.setdefault(w, [0, None])[0] = _SEVERITY_RANK[level]
+    forms = {}
+    for word, (level, rank) in table.items():
+        for form in INFLECTIONS.get(word, ()):
+            # An exact keyword always beats another keyword's inflection ("shipping" is its own keyword)
+            if form not in table: forms[form] = (level, rank)
+    forms.update((word, tuple(entry)) for word, entry in table.items())
+    return forms
+
+_FORMS = _build()
+_FORM_SET = set(_FORMS)
+
+def classify(text):
+    """Single pass over text. Returns (severity, image_category)."""
+    text_lower = (text or "").lower()
+    found = _FORM_SET.intersection(text_lower.translate(_SEPARATORS).split())
+    if "cyber" in text_lower or "hack" in text_lower:
+        found = found.union(_PREFIX.findall(text_lower))
+    if not found: return "WATCH", DEFAULT_CATEGORY
+    severity, best_rank = 0, len(IMAGE_CATEGORIES)
+    for form in found:
+        level, rank = _FORMS[form]
+        if level > severity: severity = level
+        if rank is not None and rank < best_rank: best_rank = rank
+    level = "HIGH" if severity == 2 else "MEDIUM" if severity == 1 else "WATCH"
+    category = IMAGE_CATEGORIES[best_rank][0] if best_rank < len(IMAGE_CATEGORIES) else DEFAULT_CATEGORY
+    return level, category
+
+def classify_batch(texts):
+    """Classifies a list of articles at once; returns [(severity, image_category), ...] in input order."""
+    return [classify(t) for t in texts]
+
+def risk_level(text):
+    return classify(text)[0]
+
+def image_category(text):
+    return classify(text)[1]
+
+# Headlines that once misfired, with the expected (severity, category); checked by `python taxonomy.py`
+EXAMPLES = [
+    ("Hospital ward reopens", "WATCH", DEFAULT_CATEGORY),
+    ("Humanitarian aid arrives", "WATCH", DEFAULT_CATEGORY),
+    ("Local band plays", "WATCH", DEFAULT_CATEGORY),
+    ("Candidates courted voters", "WATCH", DEFAULT_CATEGORY),
+    ("Police stormed the building", "WATCH", DEFAULT_CATEGORY),
+    ("Regulators banned the exports", "WATCH", "SANCTIONS"),
+    ("Grain shipped through the strait", "WATCH", "MARITIME"),
+    ("New sanctions announced", "HIGH", "SANCTIONS"),
+    ("Tanker attacked near the port", "HIGH", "MARITIME"),
+    ("Hackers leak files", "WATCH", "CYBER"),
+    ("Warning over tariffs", "MEDIUM", "ECONOMY"),
+    ("Warring factions agree to meet", "HIGH", "GEOPOLITICS"),
+]
+
+if __name__ == "__main__":
+    failures = [(text, expected, classify(text)) for text, *expected in EXAMPLES if classify(text) != tuple(expected)]
+    for text, expected, got in failures: print(f"MISCLASSIFIED {text!r}: expected {tuple(expected)}, got {got}")
+    if failures: raise SystemExit(1)
+    print(f"{len(EXAMPLES)} example headlines classified as expected")
+
+    # Benchmark against the original substring implementations
+    import random
+    import time
+
+    def legacy_risk_level(text):
+        text_lower = text.lower()
+        if sum(1 for k in HIGH_KEYWORDS if k in text_lower) >= 1: return "HIGH"
+        if sum(1 for k in MEDIUM_KEYWORDS if k in text_lower) >= 1: return "MEDIUM"
+        return "WATCH"
+
+    def legacy_image_category(text):
+        text_lower = text.lower()
+        for name, words in IMAGE_CATEGORIES:
+            if any(x in text_lower for x in words): return name
+        return DEFAULT_CATEGORY
+
+    rng = random.Random(42)
+    filler = ("officials noted the prize winning ministry announced on monday that regional partners would "
+              "continue to assess the outlook after weekend discussions with analysts lenders and exporters").split()
+    keywords = [w for _, ws in IMAGE_CATEGORIES for w in ws] + HIGH_KEYWORDS + MEDIUM_KEYWORDS
+    for n in (1000, 10000, 50000):
+        # Title + description sized texts, mostly ordinary prose with the odd keyword
+        corpus = [" ".join(rng.choice(keywords) if rng.random() < 0.04 else rng.choice(filler)
+                           for _ in range(rng.randint(20, 60))) for _ in range(n)]
+        t0 = time.perf_counter()
+        old = [(legacy_risk_level(t), legacy_image_category(t)) for t in corpus]
+        t1 = time.perf_counter()
+        new = classify_batch(corpus)
+        t2 = time.perf_counter()
+        changed = sum(a != b for a, b in zip(old, new))
+        print(f"{n:>6} headlines  legacy {t1 - t0:.3f}s  compiled {t2 - t1:.3f}s  "
+              f"speedup {(t1 - t0) / max(t2 - t1, 1e-9):.1f}x  reclassified {changed} (substring false positives)")